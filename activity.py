@@ -0,0 +1,179 @@
+import array
+import datetime
+
+# Days kept at daily resolution before being rolled up into weekly totals.
+ROLLUP_HORIZON = 365
+
+
+def _running(counts, base=0):
+    totals = array.array("I")
+    for count in counts:
+        base += count
+        totals.append(base)
+    return totals
+
+
+def _counts(totals):
+    values = totals.tolist()
+    return [b - a for a, b in zip([0] + values, values)]
+
+
+def _span(totals, lo, hi):
+    return totals[hi] - (totals[lo - 1] if lo else 0)
+
+
+def _week(day):
+    # Date ordinal 1 is a Monday, so weeks run Monday to Sunday.
+    return (day - 1) // 7
+
+
+class ActivitySeries:
+    """Solves per day for one user.
+
+    Days are date ordinals. Recent days are stored as running totals in an
+    array('I') indexed from `start`, so any window sum is two lookups. Days
+    older than the rollup horizon are folded into weekly running totals
+    indexed from week `week_start`; a rolled-up week counts towards a window
+    when its Monday falls inside it. Rolled-up days are read-only."""
+
+    __slots__ = ("start", "totals", "week_start", "weeks")
+
+    def __init__(self):
+        self.start = None
+        self.totals = array.array("I")
+        self.week_start = None
+        self.weeks = None
+
+    @classmethod
+    def from_dict(cls, activity):
+        # The pre-series layout: {"YYYY-MM-DD": count}.
+        series = cls()
+        counts = {datetime.date.fromisoformat(date).toordinal(): int(count) for date, count in activity.items()}
+        if counts:
+            series.start = min(counts)
+            series.totals = _running(counts.get(day, 0) for day in range(series.start, max(counts) + 1))
+        return series
+
+    @classmethod
+    def load(cls, obj):
+        if isinstance(obj, cls):
+            return obj
+        if not obj:
+            return cls()
+        if not isinstance(obj.get("days"), list):
+            return cls.from_dict(obj)
+        series = cls()
+        if obj.get("start"):
+            series.start = datetime.date.fromisoformat(obj["start"]).toordinal()
+            series.totals = _running(obj["days"])
+        if obj.get("weeks"):
+            series.week_start = _week(datetime.date.fromisoformat(obj["weeks_start"]).toordinal())
+            series.weeks = _running(obj["weeks"])
+        return series
+
+    def dump(self):
+        obj = {"start": None, "days": []}
+        if self.start is not None:
+            obj["start"] = datetime.date.fromordinal(self.start).isoformat()
+            obj["days"] = _counts(self.totals)
+        if self.weeks:
+            obj["weeks_start"] = datetime.date.fromordinal(self.week_start * 7 + 1).isoformat()
+            obj["weeks"] = _counts(self.weeks)
+        return obj
+
+    def copy(self):
+        series = ActivitySeries()
+        series.start = self.start
+        series.totals = self.totals[:]
+        series.week_start = self.week_start
+        series.weeks = self.weeks[:] if self.weeks is not None else None
+        return series
+
+    def _rolled_until(self):
+        if not self.weeks:
+            return None
+        return (self.week_start + len(self.weeks)) * 7 + 1
+
+    def get(self, day):
+        if self.start is None or not self.start <= day < self.start + len(self.totals):
+            return 0
+        return _span(self.totals, day - self.start, day - self.start)
+
+    def set(self, day, count):
+        rolled_until = self._rolled_until()
+        if rolled_until is not None and day < rolled_until:
+            return
+        if not self.totals:
+            self.start = day
+            self.totals = array.array("I", [count])
+            return
+        if day < self.start:
+            self.totals = array.array("I", [0]) * (self.start - day) + self.totals
+            self.start = day
+        end = self.start + len(self.totals)
+        if day >= end:
+            self.totals.extend(array.array("I", [self.totals[-1]]) * (day - end + 1))
+        i = day - self.start
+        delta = count - _span(self.totals, i, i)
+        if delta:
+            # Only out-of-order days touch more than the last slot.
+            for j in range(i, len(self.totals)):
+                self.totals[j] += delta
+
+    def total(self, first, last):
+        result = 0
+        if self.totals and first <= last:
+            lo = max(first, self.start) - self.start
+            hi = min(last, self.start + len(self.totals) - 1) - self.start
+            if lo <= hi:
+                result += _span(self.totals, lo, hi)
+        if self.weeks:
+            lo = max(_week(first + 6), self.week_start) - self.week_start
+            hi = min(_week(last), self.week_start + len(self.weeks) - 1) - self.week_start
+            if lo <= hi:
+                result += _span(self.weeks, lo, hi)
+        return result
+
+    def active_days(self):
+        if self.start is None:
+            return []
+        return [self.start + i for i, count in enumerate(_counts(self.totals)) if count]
+
+    def items(self):
+        # (day, count) pairs; rolled-up weeks are reported on their Monday.
+        if self.weeks:
+            for i, count in enumerate(_counts(self.weeks)):
+                if count:
+                    yield (self.week_start + i) * 7 + 1, count
+        if self.start is not None:
+            for i, count in enumerate(_counts(self.totals)):
+                if count:
+                    yield self.start + i, count
+
+    def roll_up(self, cutoff):
+        # Folds whole weeks that end before `cutoff` into weekly totals.
+        boundary = _week(cutoff) * 7 + 1
+        if self.start is None or self.start >= boundary:
+            return False
+        end = min(boundary, self.start + len(self.totals))
+        first_week = _week(self.start)
+        if self.weeks is None:
+            self.week_start = first_week
+            self.weeks = array.array("I")
+        base = self.weeks[-1] if self.weeks else 0
+        for week in range(self.week_start + len(self.weeks), first_week):
+            self.weeks.append(base)
+        for week in range(first_week, _week(end - 1) + 1):
+            lo = max(week * 7 + 1, self.start) - self.start
+            hi = min(week * 7 + 7, end - 1) - self.start
+            base += _span(self.totals, lo, hi)
+            self.weeks.append(base)
+        rolled = end - self.start
+        if rolled >= len(self.totals):
+            self.start = None
+            self.totals = array.array("I")
+        else:
+            offset = self.totals[rolled - 1]
+            self.totals = array.array("I", (total - offset for total in self.totals[rolled:]))
+            self.start = end
+        return True
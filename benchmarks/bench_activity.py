@@ -0,0 +1,115 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity import ActivitySeries
+
+
+def make_histories(users, days, density):
+    today = datetime.date.today().toordinal()
+    return [[(today - offset, random.randint(1, 5)) for offset in range(days) if random.random() < density] for _ in range(users)]
+
+
+def build_dicts(histories):
+    # What record_solve() used to build: a fresh ISO string key per entry.
+    return [{datetime.date.fromordinal(day).isoformat(): count for day, count in history} for history in histories]
+
+
+def build_loaded_dicts(histories):
+    # The same form after json.load(), which shares repeated keys.
+    return json.loads(json.dumps(build_dicts(histories)))
+
+
+def build_series(histories, horizon=None):
+    cutoff = datetime.date.today().toordinal() - horizon if horizon is not None else None
+    result = []
+    for history in histories:
+        series = ActivitySeries()
+        for day, count in reversed(history):
+            series.set(day, count)
+        if cutoff is not None:
+            series.roll_up(cutoff)
+        result.append(series)
+    return result
+
+
+def measure(build, histories):
+    gc.collect()
+    tracemalloc.start()
+    obj = build(histories)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def old_window(activity, today, days):
+    # What /progress and /user_report did per call.
+    return sum(activity.get((today - datetime.timedelta(days=i)).isoformat(), 0) for i in range(days))
+
+
+def timed(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) / (repeat * len(items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and window-sum cost of ActivitySeries against the dict-of-ISO-strings activity.")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--density", type=float, default=0.5, help="fraction of days with activity")
+    parser.add_argument("--sample", type=int, default=None, help="measure this many users and scale to --users")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[365, 90])
+    args = parser.parse_args()
+
+    random.seed(0)
+    sample = min(args.sample or args.users, args.users)
+    scale = args.users / sample
+    histories = make_histories(sample, args.days, args.density)
+    entries = sum(len(history) for history in histories)
+    print(f"users={args.users} days={args.days} density={args.density} entries/user={entries / sample:.0f}"
+          + (f" (measured on {sample} users, scaled x{scale:.0f})" if scale != 1 else ""))
+
+    forms = [("dict, runtime keys", build_dicts), ("dict, json.load", build_loaded_dicts), ("series, no rollup", build_series)]
+    forms += [(f"series, rollup {horizon}d", lambda h, horizon=horizon: build_series(h, horizon)) for horizon in args.horizons]
+    baseline = None
+    built = {}
+    for name, build in forms:
+        obj, size = measure(build, histories)
+        baseline = baseline or size
+        total = size * scale
+        print(f"{name:22} {total / 2**20:10.1f} MiB  {size / sample:8.0f} B/user  ({baseline / size:5.1f}x smaller)")
+        if name in ("dict, runtime keys", "series, no rollup"):
+            built[name] = obj
+        del obj
+        gc.collect()
+
+    dicts = built["dict, runtime keys"]
+    series = built["series, no rollup"]
+    for left, right in zip(dicts, series):
+        assert sum(left.values()) == right.total(0, 10**7)
+    today = datetime.date.today()
+    probe = random.sample(range(sample), min(sample, 1000))
+    for days in (7, 30):
+        old = timed(lambda i: old_window(dicts[i], today, days), probe, 3)
+        new = timed(lambda i: series[i].total(today.toordinal() - days + 1, today.toordinal()), probe, 3)
+        assert all(old_window(dicts[i], today, days) == series[i].total(today.toordinal() - days + 1, today.toordinal()) for i in probe)
+        print(f"{days:2}-day window sum  dict {old * 1e6:7.2f} us   series {new * 1e6:5.2f} us   ({old / new:.0f}x)")
+
+    old_json = sum(len(json.dumps(activity)) for activity in dicts) * scale
+    new_json = sum(len(json.dumps(s.dump())) for s in series) * scale
+    print(f"data.json activity    dict {old_json / 2**20:8.1f} MiB   series {new_json / 2**20:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from codeblock import has_code_block
+from state_service import RemoteBackend
+from storage import JsonBackend
+
+FILLER = "This is a normal chat message that mentions some code but has no block in it. "
+
+
+def guilds_for(shard_ids, shard_count, guilds):
+    # Discord routes a guild to shard (guild_id >> 22) % shard_count.
+    return [guild_id for guild_id in guilds if (guild_id >> 22) % shard_count in shard_ids]
+
+
+def make_payload(guild_id, user_id, rng):
+    content = FILLER * rng.randint(1, 3)
+    if rng.random() < 0.3:
+        content += "```py\nprint('hi')\n```"
+    # Roughly the shape and size of a MESSAGE_CREATE dispatch.
+    return json.dumps({"op": 0, "t": "MESSAGE_CREATE", "s": 1, "d": {
+        "id": str(rng.getrandbits(63)), "channel_id": str(guild_id + 1), "guild_id": str(guild_id), "content": content,
+        "author": {"id": str(user_id), "username": f"user{user_id}", "global_name": None, "avatar": None, "discriminator": "0"},
+        "member": {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False},
+        "attachments": [], "embeds": [], "mentions": [], "mention_roles": [], "pinned": False, "tts": False,
+        "timestamp": "2024-01-01T00:00:00+00:00", "type": 0, "flags": 0,
+    }})
+
+
+async def handle(backend, raw):
+    message = json.loads(raw)["d"]
+    guild_id, user_id = message["guild_id"], message["author"]["id"]
+    await backend.ensure_user(guild_id, user_id)
+    if has_code_block(message["content"]):
+        await backend.record_solve(guild_id, user_id)
+        return 1
+    return 0
+
+
+async def drive(backend, payloads, concurrency):
+    queue = iter(payloads)
+    solves = 0
+
+    async def consumer():
+        nonlocal solves
+        for raw in queue:
+            solved = await handle(backend, raw)
+            solves += solved
+
+    await asyncio.gather(*(consumer() for _ in range(concurrency)))
+    return solves
+
+
+def worker(socket_path, shard_ids, args, ready, start, results):
+    rng = random.Random(shard_ids[0])
+    guilds = guilds_for(shard_ids, args.shards, [(i << 22) + i for i in range(args.guilds)])
+    payloads = [make_payload(rng.choice(guilds), rng.randrange(args.users), rng) for _ in range(args.messages // args.current_workers)]
+
+    async def run():
+        backend = RemoteBackend(socket_path)
+        await backend.ensure_user("warmup", "0")
+        ready.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, start.wait)
+        began = time.perf_counter()
+        solves = await drive(backend, payloads, args.concurrency)
+        results.put((len(payloads), solves, time.perf_counter() - began))
+
+    asyncio.run(run())
+
+
+def run_cluster(socket_path, workers, args):
+    ctx = multiprocessing.get_context("spawn")
+    ready, results, start = ctx.Queue(), ctx.Queue(), ctx.Event()
+    args.current_workers = workers
+    processes = [ctx.Process(target=worker, args=(socket_path, list(range(i, args.shards, workers)), args, ready, start, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get()
+    began = time.perf_counter()
+    start.set()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+    return sum(count for count, _, _ in outcomes), sum(solves for _, solves, _ in outcomes), elapsed
+
+
+def run_single(directory, args):
+    # Today's deployment: one process, the backend in-process.
+    rng = random.Random(0)
+    guilds = [(i << 22) + i for i in range(args.guilds)]
+    payloads = [make_payload(rng.choice(guilds), rng.randrange(args.users), rng) for _ in range(args.messages)]
+    backend = JsonBackend(os.path.join(directory, "single.json"), os.path.join(directory, "single.journal"))
+
+    async def run():
+        began = time.perf_counter()
+        await drive(backend, payloads, args.concurrency)
+        return time.perf_counter() - began
+
+    elapsed = asyncio.run(run())
+    return len(payloads) / elapsed
+
+
+async def total_solves(socket_path, users):
+    return sum(user["problems_solved"] for _, user in await RemoteBackend(socket_path).global_top_solvers(users))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated message traffic across sharded worker processes sharing the state service.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--messages", type=int, default=40000, help="messages per run, split across workers")
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight messages per worker")
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} shards={args.shards} guilds={args.guilds} messages={args.messages}")
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"single process, in-process backend: {run_single(directory, args):10.0f} msg/s")
+        socket_path = os.path.join(directory, "state.sock")
+        service = subprocess.Popen([sys.executable, os.path.join(ROOT, "state_service.py")], cwd=directory,
+                                   env={**os.environ, "STATE_SOCKET": socket_path}, stdout=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.05)
+            baseline = None
+            expected = 0
+            for workers in args.workers:
+                count, solves, elapsed = run_cluster(socket_path, workers, args)
+                expected += solves
+                throughput = count / elapsed
+                baseline = baseline or throughput
+                print(f"{workers:2} worker process(es):               {throughput:10.0f} msg/s  ({throughput / baseline:.2f}x)")
+            recorded = asyncio.run(total_solves(socket_path, args.users + 1))
+            assert recorded == expected, (recorded, expected)
+            print(f"state service recorded all {recorded} solves")
+        finally:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
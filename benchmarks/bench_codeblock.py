@@ -0,0 +1,61 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codeblock import has_code_block, scan_code_blocks
+
+
+def old_detector(content):
+    return re.search(r"```(.|\n)*```", content) is not None
+
+
+def corpus():
+    words = "the quick brown fox jumps over lazy dog segfault python rust vector".split()
+    chat = " ".join(random.choice(words) for _ in range(40))
+    code = "def solve(nums):\n    return sorted(nums)[::-1]\n" * 5
+    return {
+        "plain chat": chat,
+        "inline code": f"try `sorted()` and `reversed()` {chat}",
+        "python block": f"here is mine\n```python\n{code}```\nthoughts?",
+        "two blocks": "```cpp\nint main() {}\n```\nvs\n```rust\nfn main() {}\n```",
+        "long block": "```\n" + code * 40 + "```",
+        "unclosed fence, 2k chars": "```\n" + "x = 1\n" * 330,
+        "700 fence pairs (4k)": "``` ``" * 700,
+        "overlapping fences then 8k text": "`````" + chat * 30,
+        "backtick flood (4k)": "``" + " `" * 2000,
+        "open fence then 4k of lines": "```" + "\n" * 4000,
+    }
+
+
+def worst_case(fn, content, repeat):
+    worst = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        worst = max(worst, time.perf_counter() - start)
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the code-block detector with the old regex.")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'message':<34} {'regex worst':>12} {'detector worst':>15} {'blocks':>7}")
+    for name, content in corpus().items():
+        assert has_code_block(content) == old_detector(content), name
+        old = worst_case(old_detector, content, args.repeat)
+        new = worst_case(has_code_block, content, args.repeat)
+        blocks = scan_code_blocks(content)
+        languages = ",".join(block.language for block in blocks if block.language)
+        print(f"{name:<34} {old * 1e6:10.1f}us {new * 1e6:13.1f}us {len(blocks):>7} {languages}")
+
+
+if __name__ == "__main__":
+    main()
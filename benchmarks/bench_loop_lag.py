@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_persistence import make_dataset
+from persistence import LoopLagMonitor
+from activity import ActivitySeries
+from storage import ActivityStore
+
+
+async def measure(save, saves):
+    monitor = LoopLagMonitor(interval=0.005, warn_after=float("inf"))
+    monitor.start()
+    await asyncio.sleep(0.05)
+    await asyncio.gather(*(save() for _ in range(saves)))
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    return monitor.stats()
+
+
+async def run(args, directory):
+    data = make_dataset(args.users, args.days)
+    path = os.path.join(directory, "data.json")
+
+    async def save_data():
+        # The old handler behaviour: a synchronous rewrite inside the coroutine.
+        with open(path, "w") as file:
+            json.dump(data, file, indent=4)
+
+    store = ActivityStore(path, os.path.join(directory, "data.journal"))
+    store.data = {"1": {user_id: {**user, "activity": ActivitySeries.from_dict(user["activity"])} for user_id, user in data.items()}}
+
+    old = await measure(save_data, args.saves)
+    new = await measure(lambda: store.writer.save(store._snapshot), args.saves)
+    return old, new, store.writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag while saving, old save_data() against SnapshotWriter.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--saves", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        old, new, writer = asyncio.run(run(args, directory))
+    print(f"users={args.users} concurrent saves={args.saves}")
+    for name, stats in (("save_data()", old), ("SnapshotWriter", new)):
+        print(f"{name:<15} loop lag p50={stats['p50'] * 1e3:7.2f}ms p99={stats['p99'] * 1e3:7.2f}ms max={stats['max'] * 1e3:7.2f}ms")
+    print(f"SnapshotWriter coalesced {writer.requests} save requests into {writer.writes} writes")
+
+
+if __name__ == "__main__":
+    main()
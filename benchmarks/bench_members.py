@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import datetime
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def rss_mib():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def run_mode(lean, size, args, results):
+    # One process per run: RSS never shrinks, so modes cannot share one.
+    from fake_gateway import FakeGateway, FakeRest
+    from main import create_bot
+    from persistence import write_json_atomic
+    from reminders import TokenBucket
+    from storage import JsonBackend
+
+    rng = random.Random(size)
+    members = {}
+    data = {}
+    stale = (datetime.datetime.utcnow() - datetime.timedelta(days=3)).isoformat()
+    for i in range(args.guilds):
+        guild_id = (i + 1) << 22
+        members[guild_id] = list(range(10**17 + i * size, 10**17 + (i + 1) * size))
+        tracked = rng.sample(members[guild_id], int(size * args.tracked))
+        data[str(guild_id)] = {str(user_id): {"problems_solved": 1, "last_active": stale, "activity": {}, "goal": 0} for user_id in tracked}
+
+    async def run(directory):
+        write_json_atomic(os.path.join(directory, "data.json"), data)
+        storage = JsonBackend(os.path.join(directory, "data.json"), os.path.join(directory, "data.journal"))
+        bot = create_bot(storage, reminder_file=os.path.join(directory, "reminders.json"), lean_members=lean, member_cache_size=args.member_cache_size)
+        bot.reminders.bucket = TokenBucket(1e9, 1e9)
+        FakeRest().install(bot)
+        gateway = FakeGateway(bot, members)
+        baseline = rss_mib()
+        ready = await gateway.connect()
+        # on_ready starts the daily reminder loop; passes are timed separately below.
+        while not bot.auto_reminder.is_running():
+            await asyncio.sleep(0)
+        bot.auto_reminder.cancel()
+        ready_rss = rss_mib()
+        cached = sum(len(guild.members) for guild in bot.guilds)
+        mentioned, queries = bot.reminders.mentioned, bot.members.queries
+        started, encoding = time.perf_counter(), gateway.encode_seconds
+        await bot.auto_reminder()
+        reminder = time.perf_counter() - started - (gateway.encode_seconds - encoding)
+        storage.close()
+        return ready, ready_rss - baseline, cached, reminder, bot.reminders.mentioned - mentioned, bot.members.queries - queries
+
+    with tempfile.TemporaryDirectory() as directory:
+        outcome = asyncio.run(run(directory))
+    results.put((*outcome, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS and time to ready with full member chunking against lean member caching, over a fake gateway.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000, 500_000], help="members per guild")
+    parser.add_argument("--guilds", type=int, default=1)
+    parser.add_argument("--tracked", type=float, default=0.01, help="fraction of members with a stored record, all due a reminder")
+    parser.add_argument("--member-cache-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"guilds={args.guilds} tracked={args.tracked} member cache={args.member_cache_size}")
+    print(f"{'members':>8} {'mode':5} {'ready':>8} {'+rss':>9} {'peak rss':>9} {'cached':>8} {'reminder run':>13} {'mentions':>8} {'queries':>7}")
+    for size in args.sizes:
+        for lean in (False, True):
+            results = ctx.Queue()
+            process = ctx.Process(target=run_mode, args=(lean, size, args, results))
+            process.start()
+            ready, grown, cached, reminder, mentioned, queries, peak = results.get()
+            process.join()
+            print(f"{size:8} {'lean' if lean else 'full':5} {ready:7.2f}s {grown:5.0f} MiB {peak:5.0f} MiB {cached:8} {reminder * 1e3:10.1f} ms {mentioned:8} {queries:7}")
+
+
+if __name__ == "__main__":
+    main()
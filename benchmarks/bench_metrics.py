@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from codeblock import has_code_block
+
+
+async def handler(content):
+    return has_code_block(content)
+
+
+@metrics.timed(metrics.ON_MESSAGE_SECONDS)
+async def instrumented(content):
+    metrics.MESSAGES_SCANNED.inc()
+    if has_code_block(content):
+        metrics.CODE_BLOCKS.inc()
+        return True
+    return False
+
+
+async def run(fn, messages):
+    content = "just chatting about `sorted()` and nothing else " * 4
+    start = time.perf_counter()
+    for _ in range(messages):
+        await fn(content)
+    return (time.perf_counter() - start) / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-message cost of the on_message instrumentation.")
+    parser.add_argument("--messages", type=int, default=500_000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(run(handler, args.messages))
+    timed = asyncio.run(run(instrumented, args.messages))
+    print(f"bare handler:         {bare * 1e9:8.0f} ns/message")
+    print(f"instrumented handler: {timed * 1e9:8.0f} ns/message  (+{(timed - bare) * 1e9:.0f} ns)")
+
+
+if __name__ == "__main__":
+    main()
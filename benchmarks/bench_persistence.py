@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity import ActivitySeries
+from storage import ActivityStore
+
+
+def make_dataset(users, days):
+    today = datetime.date.today()
+    data = {}
+    for i in range(users):
+        activity = {(today - datetime.timedelta(days=d)).isoformat(): random.randint(1, 5) for d in range(days) if random.random() < 0.5}
+        data[str(100000000000000000 + i)] = {"problems_solved": sum(activity.values()), "last_active": datetime.datetime.utcnow().isoformat(), "activity": activity, "goal": 0}
+    return data
+
+
+def bench_save_data(data, messages, path):
+    # The pre-journal behaviour: rewrite the whole file for every credited block.
+    user_ids = list(data)
+    start = time.perf_counter()
+    for _ in range(messages):
+        user = data[random.choice(user_ids)]
+        current_date = datetime.datetime.utcnow().date().isoformat()
+        user["activity"][current_date] = user["activity"].get(current_date, 0) + 1
+        user["problems_solved"] += 1
+        user["last_active"] = datetime.datetime.utcnow().isoformat()
+        with open(path, "w") as file:
+            json.dump(data, file, indent=4)
+    return messages / (time.perf_counter() - start)
+
+
+async def bench_store(data, messages, directory):
+    store = ActivityStore(os.path.join(directory, "store.json"), os.path.join(directory, "store.journal"), flush_interval=0.05)
+    store.data = {"1": data}
+    for user in data.values():
+        user["activity"] = ActivitySeries.from_dict(user["activity"])
+    user_ids = list(data)
+    store.start()
+    start = time.perf_counter()
+    for i in range(messages):
+        store.record_solve("1", random.choice(user_ids))
+        if i % 100 == 0:
+            # Yield like a real gateway loop would between messages.
+            await asyncio.sleep(0)
+    await store.flush()
+    elapsed = time.perf_counter() - start
+    store.close()
+    return messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare save_data() rewrites against the write-behind journal store.")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = bench_save_data(make_dataset(args.users, args.days), args.messages, os.path.join(directory, "data.json"))
+        journal = asyncio.run(bench_store(make_dataset(args.users, args.days), args.messages * 50, directory))
+    print(f"users={args.users} days={args.days}")
+    print(f"save_data:     {baseline:12.1f} msg/s")
+    print(f"ActivityStore: {journal:12.1f} msg/s  ({journal / baseline:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
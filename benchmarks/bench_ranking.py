@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranking import RankIndex
+
+
+def sort_rank(data, user_id):
+    # What /stats did before the index existed.
+    sorted_users = sorted(data.items(), key=lambda x: x[1].get("problems_solved", 0), reverse=True)
+    user_ids = [uid for uid, _ in sorted_users]
+    return user_ids.index(user_id) + 1
+
+
+def sort_top(data, count):
+    # What /leaderboard did before the index existed.
+    return [uid for uid, _ in sorted(data.items(), key=lambda x: x[1].get("problems_solved", 0), reverse=True)[:count]]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(users, queries):
+    data = {str(i): {"problems_solved": random.randint(0, 500)} for i in range(users)}
+    user_ids = list(data)
+
+    start = time.perf_counter()
+    ranks = RankIndex((user_id, user["problems_solved"]) for user_id, user in data.items())
+    build = time.perf_counter() - start
+
+    probe = random.choice(user_ids)
+    assert ranks.rank(probe) == sort_rank(data, probe)
+    assert [user_id for user_id, _ in ranks.top(10)] == sort_top(data, 10)
+
+    def update():
+        user_id = random.choice(user_ids)
+        data[user_id]["problems_solved"] += 1
+        ranks.update(user_id, data[user_id]["problems_solved"])
+
+    baseline_repeat = max(1, queries // (users // 1000))
+    results = {
+        "build": build,
+        "update": timed(update, queries),
+        "rank": timed(lambda: ranks.rank(random.choice(user_ids)), queries),
+        "top10": timed(lambda: ranks.top(10), queries),
+        "sort rank": timed(lambda: sort_rank(data, random.choice(user_ids)), baseline_repeat),
+        "sort top10": timed(lambda: sort_top(data, 10), baseline_repeat),
+    }
+    probe = random.choice(user_ids)
+    assert ranks.rank(probe) == sort_rank(data, probe)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the rank index against sorting every user per command.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    for users in args.sizes:
+        results = bench(users, args.queries)
+        print(f"users={users}")
+        for name, seconds in results.items():
+            print(f"  {name:<11} {seconds * 1e6:14.1f} us")
+        print(f"  rank speedup  {results['sort rank'] / results['rank']:10.0f}x")
+        print(f"  top10 speedup {results['sort top10'] / results['top10']:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reminders import REMINDER_INTERVAL, ReminderScheduler
+
+
+class FakeChannel:
+    def __init__(self):
+        self.name = "general"
+        self.sends = 0
+
+    def permissions_for(self, member):
+        return types.SimpleNamespace(send_messages=True)
+
+    async def send(self, content):
+        assert len(content) <= 2000
+        self.sends += 1
+
+
+class FakeGuild:
+    def __init__(self, guild_id, member_ids):
+        self.id = guild_id
+        self.me = None
+        self.system_channel = FakeChannel()
+        self.text_channels = [self.system_channel]
+        self._members = {member_id: types.SimpleNamespace(id=member_id, bot=False, mention=f"<@{member_id}>") for member_id in member_ids}
+        self.members = list(self._members.values())
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+
+async def old_auto_reminder(guilds, data):
+    # The original loop: every member, every guild, one send per inactive member.
+    current_time = datetime.datetime.utcnow()
+    for guild in guilds:
+        for member in guild.members:
+            if member.bot:
+                continue
+            user_data = data.get(str(member.id), {})
+            last_active_str = user_data.get("last_active", "Never")
+            if last_active_str == "Never":
+                last_active = None
+            else:
+                last_active = datetime.datetime.fromisoformat(last_active_str.split("+")[0])
+            if last_active and (current_time - last_active).total_seconds() > 86400:
+                channel = guild.system_channel
+                await channel.send(f"{member.mention}, we noticed you haven't shared code recently. Keep up your learning journey!")
+
+
+def make_population(members, tracked_ratio, inactive_ratio):
+    now = datetime.datetime.utcnow()
+    member_ids = [100000000000000000 + i for i in range(members)]
+    data = {}
+    for member_id in random.sample(member_ids, int(members * tracked_ratio)):
+        hours = random.uniform(25, 24 * 30) if random.random() < inactive_ratio else random.uniform(0, 23)
+        data[str(member_id)] = {"last_active": (now - datetime.timedelta(hours=hours)).isoformat()}
+    return member_ids, data
+
+
+async def run(args):
+    member_ids, data = make_population(args.members, args.tracked, args.inactive)
+
+    guild = FakeGuild(1, member_ids)
+    start = time.perf_counter()
+    await old_auto_reminder([guild], data)
+    old = time.perf_counter() - start
+    old_sends = guild.system_channel.sends
+
+    with tempfile.TemporaryDirectory() as directory:
+        state_file = os.path.join(directory, "reminders.json")
+        guild = FakeGuild(1, member_ids)
+        scheduler = ReminderScheduler(state_file, rate=1e9, burst=1e9)
+        scheduler.load({"1": {user_id: user["last_active"] for user_id, user in data.items()}})
+        first_pass = datetime.datetime.utcnow()
+        start = time.perf_counter()
+        await scheduler.run([guild], now=first_pass)
+        new = time.perf_counter() - start
+        new_sends = guild.system_channel.sends
+
+        # A restart 13h later waits for the next scheduled pass, and even a
+        # pass run right away repeats nobody.
+        restart = first_pass + datetime.timedelta(hours=13)
+        restarted = ReminderScheduler(state_file, rate=1e9, burst=1e9)
+        restarted.load({"1": {user_id: user["last_active"] for user_id, user in data.items()}})
+        wait = restarted.until_next_pass(restart)
+        await restarted.run([guild], now=restart)
+        resent = sum(restarted._reminded.get(key) == restart for key in scheduler._reminded)
+
+        # The next scheduled pass, one interval on, reminds everyone still inactive.
+        next_pass = first_pass + REMINDER_INTERVAL
+        await restarted.run([guild], now=next_pass)
+        again = sum(restarted._reminded.get(key) == next_pass for key in scheduler._reminded)
+
+    print(f"members={args.members} tracked={len(data)} reminded={scheduler.mentioned}")
+    print(f"original loop:  {old * 1e3:9.1f} ms  channel.send calls={old_sends}")
+    print(f"scheduler:      {new * 1e3:9.1f} ms  channel.send calls={new_sends}")
+    print(f"restart {restart - first_pass} after a pass: next pass in {datetime.timedelta(seconds=wait)}, reminders repeated: {resent}")
+    print(f"reminded again on the next scheduled pass: {again} of {len(scheduler._reminded)}")
+    assert wait == (first_pass + REMINDER_INTERVAL - restart).total_seconds() and resent == 0 and again == len(scheduler._reminded), (wait, resent, again)
+    print(f"at the default 0.5 msg/s the scheduler's sends take {new_sends / 0.5 / 60:.1f} min instead of flooding")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare auto_reminder's member walk with the batched reminder scheduler.")
+    parser.add_argument("--members", type=int, default=100_000)
+    parser.add_argument("--tracked", type=float, default=0.3)
+    parser.add_argument("--inactive", type=float, default=0.5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity import ActivitySeries
+from fake_gateway import FakeGateway, FakeRest, interaction_create, message_create
+from main import create_bot
+from persistence import write_json_atomic
+from reminders import TokenBucket
+from storage import JsonBackend
+
+FILLER = "This is a normal chat message that mentions some code but has no block in it. "
+COMMANDS = {
+    "leaderboard": [(), (("scope", "global"),)],
+    "stats": [()],
+    "top_streaks": [()],
+}
+
+
+def make_dataset(args, rng):
+    # Guild members drawn from one user pool; a `tracked` fraction of each
+    # guild's members has a stored record with `days` of sparse activity.
+    today = datetime.datetime.utcnow()
+    pool = [10**17 + i for i in range(args.users)]
+    members = {}
+    data = {}
+    for i in range(args.guilds):
+        guild_id = (i + 1) << 22
+        members[guild_id] = rng.sample(pool, min(args.members, len(pool)))
+        partition = data[str(guild_id)] = {}
+        for user_id in members[guild_id][:int(len(members[guild_id]) * args.tracked)]:
+            activity = ActivitySeries()
+            for offset in sorted(rng.sample(range(args.days), rng.randint(1, max(1, args.days // 4))), reverse=True):
+                activity.set(today.toordinal() - offset, rng.randint(1, 5))
+            last_active = today - datetime.timedelta(hours=rng.uniform(0, 72))
+            partition[str(user_id)] = {"problems_solved": activity.total(0, 10**7), "last_active": last_active.isoformat(),
+                                       "activity": activity, "goal": 0}
+    return members, data
+
+
+def make_events(args, members, rng):
+    guilds = list(members)
+    events = []
+    for i in range(args.messages + args.commands):
+        guild_id = rng.choice(guilds)
+        user_id = rng.choice(members[guild_id])
+        if i < args.messages:
+            content = FILLER * rng.randint(1, 3)
+            if rng.random() < args.code_fraction:
+                content += "```py\nprint('hi')\n```"
+            events.append(("on_message", 2 * 10**15 + i, message_create(2 * 10**15 + i, guild_id, user_id, content)))
+        else:
+            name = rng.choice(list(COMMANDS))
+            events.append((name, 3 * 10**15 + i, interaction_create(3 * 10**15 + i, guild_id, user_id, name, rng.choice(COMMANDS[name]))))
+    rng.shuffle(events)
+    return events
+
+
+class Recorder:
+    """Times each replayed event from the moment its payload is handed to the
+    gateway until its handler (on_message or the app command) returns."""
+
+    def __init__(self, bot, concurrency):
+        self.latencies = {}
+        self.errors = 0
+        self._started = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        schedule_event, call = bot._schedule_event, bot.tree._call
+
+        def tracked_schedule(coro, event_name, *args, **kwargs):
+            if event_name == "on_message":
+                coro = self._track(coro, "on_message", lambda message: message.id)
+            return schedule_event(coro, event_name, *args, **kwargs)
+
+        bot._schedule_event = tracked_schedule
+        bot.tree._call = self._track(call, None, lambda interaction: interaction.id)
+
+    def _track(self, handler, kind, key):
+        async def run(item, *args, **kwargs):
+            entry = self._started.pop(key(item), None)
+            try:
+                await handler(item, *args, **kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                if entry is not None:
+                    name, started = entry
+                    self.latencies.setdefault(kind or name, []).append(time.perf_counter() - started)
+                    self._slots.release()
+                    if not self._started:
+                        self._idle.set()
+        return run
+
+    async def replay(self, gateway, events):
+        for name, event_id, raw in events:
+            await self._slots.acquire()
+            self._idle.clear()
+            self._started[event_id] = (name, time.perf_counter())
+            gateway.receive(raw)
+        await self._idle.wait()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def max_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mib():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+async def run(args, directory, members, events):
+    storage = JsonBackend(os.path.join(directory, "data.json"), os.path.join(directory, "data.journal"))
+    bot = create_bot(storage, reminder_file=os.path.join(directory, "reminders.json"), solve_window=args.solve_window,
+                     lean_members=args.lean_members)
+    # The replay measures the bot's own work, not Discord's reminder rate limit.
+    bot.reminders.bucket = TokenBucket(1e9, 1e9)
+    rest = FakeRest(args.rest_latency)
+    rest.install(bot)
+    gateway = FakeGateway(bot, members)
+    ready = await gateway.connect()
+    # on_ready starts the daily reminder loop; passes are timed separately below.
+    while not bot.auto_reminder.is_running():
+        await asyncio.sleep(0)
+    bot.auto_reminder.cancel()
+    print(f"ready in {ready:.2f}s  rss {current_rss_mib():.0f} MiB")
+
+    recorder = Recorder(bot, args.concurrency)
+    began = time.perf_counter()
+    await recorder.replay(gateway, events)
+    elapsed = time.perf_counter() - began
+    print(f"replayed {len(events)} events in {elapsed:.2f}s: {len(events) / elapsed:.0f} events/s  (concurrency {args.concurrency}, errors {recorder.errors})")
+    for name, values in sorted(recorder.latencies.items()):
+        print(f"  {name:13} n={len(values):6}  p50 {percentile(values, 0.5) * 1e3:7.2f} ms  p99 {percentile(values, 0.99) * 1e3:7.2f} ms")
+
+    durations = []
+    for _ in range(args.reminder_runs):
+        # Forget who was reminded so every run does the full pass.
+        bot.reminders._reminded.clear()
+        started = time.perf_counter()
+        await bot.auto_reminder()
+        durations.append(time.perf_counter() - started)
+    if durations:
+        print(f"  {'auto_reminder':13} n={len(durations):6}  p50 {percentile(durations, 0.5) * 1e3:7.2f} ms  max {max(durations) * 1e3:7.2f} ms"
+              f"  ({bot.reminders.mentioned // len(durations)} mentions per run)")
+    lag = bot.loop_lag.stats()
+    print(f"loop lag p99 {lag['p99'] * 1e3:.1f} ms, max {lag['max'] * 1e3:.1f} ms")
+    print("REST calls: " + ", ".join(f"{key} {count}" for key, count in sorted(rest.calls.items())))
+    await bot.solves.flush()
+    storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay of gateway messages and slash commands through the real bot, with REST stubbed out.")
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=2000, help="members per guild")
+    parser.add_argument("--users", type=int, default=30000, help="size of the user pool members are drawn from")
+    parser.add_argument("--tracked", type=float, default=0.5, help="fraction of members with a stored record")
+    parser.add_argument("--days", type=int, default=120, help="days of activity history per tracked user")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--code-fraction", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=64, help="events in flight")
+    parser.add_argument("--rest-latency", type=float, default=0.0, help="seconds per stubbed REST call")
+    parser.add_argument("--solve-window", type=float, default=10.0)
+    parser.add_argument("--reminder-runs", type=int, default=3)
+    parser.add_argument("--lean-members", action="store_true", help="skip startup chunking and resolve members on demand")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    members, data = make_dataset(args, rng)
+    events = make_events(args, members, rng)
+    tracked = sum(len(partition) for partition in data.values())
+    print(f"guilds={args.guilds} members/guild={args.members} tracked records={tracked} events={len(events)}")
+    with tempfile.TemporaryDirectory() as directory:
+        write_json_atomic(os.path.join(directory, "data.json"), data, default=ActivitySeries.dump)
+        del data
+        asyncio.run(run(args, directory, members, events))
+    print(f"peak rss {max_rss_mib():.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resolver import UserResolver
+
+
+def fake_user(user_id):
+    return types.SimpleNamespace(id=user_id, name=f"user{user_id}", global_name=None,
+                                 display_name=f"user{user_id}", display_avatar=types.SimpleNamespace(url=f"https://cdn.example/{user_id}.png"))
+
+
+class FakeClient:
+    """Stands in for discord.Client: a partial gateway user cache plus a REST
+    fetch_user that sleeps to simulate a round trip."""
+
+    def __init__(self, cached_ids, latency):
+        self.latency = latency
+        self.rest_calls = 0
+        self._cache = {user_id: fake_user(user_id) for user_id in cached_ids}
+
+    def get_user(self, user_id):
+        return self._cache.get(user_id)
+
+    async def fetch_user(self, user_id):
+        self.rest_calls += 1
+        await asyncio.sleep(self.latency)
+        return fake_user(user_id)
+
+
+async def sequential(client, user_ids):
+    # What /leaderboard and /top_streaks did before the resolver.
+    return [(await client.fetch_user(user_id)).display_name for user_id in user_ids]
+
+
+async def run(args):
+    population = list(range(1, args.users + 1))
+    top = [random.sample(population, 10) for _ in range(args.commands)]
+    cached = set(random.sample(population, int(args.users * args.gateway_ratio)))
+
+    client = FakeClient(cached, args.latency)
+    start = time.perf_counter()
+    for user_ids in top:
+        await sequential(client, user_ids)
+    old = time.perf_counter() - start
+    old_calls = client.rest_calls
+
+    client = FakeClient(cached, args.latency)
+    resolver = UserResolver(client, ttl=args.ttl, maxsize=args.cache_size, concurrency=args.concurrency)
+    start = time.perf_counter()
+    for user_ids in top:
+        await resolver.resolve_many(user_ids)
+    new = time.perf_counter() - start
+
+    print(f"commands={args.commands} latency={args.latency * 1e3:.0f}ms gateway cache ratio={args.gateway_ratio}")
+    print(f"sequential fetch_user: {old / args.commands * 1e3:8.1f} ms/command  rest calls={old_calls}")
+    print(f"UserResolver:          {new / args.commands * 1e3:8.1f} ms/command  rest calls={client.rest_calls}")
+    print(f"resolver stats: {resolver.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential fetch_user calls with the caching resolver.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--gateway-ratio", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--ttl", type=float, default=600)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
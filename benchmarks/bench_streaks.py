@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import JsonBackend, advance_streak
+
+
+def get_streak(activity):
+    # The streak as the bot used to compute it: a walk back over the
+    # {"YYYY-MM-DD": count} activity from the most recent day.
+    if not activity:
+        return 0
+    today = datetime.datetime.utcnow().date()
+    active_dates = set(datetime.date.fromisoformat(date) for date in activity)
+    if not active_dates:
+        return 0
+    most_recent = max(active_dates)
+    streak = 0
+    current_date = most_recent
+    while current_date in active_dates and current_date <= today:
+        streak += 1
+        current_date -= datetime.timedelta(days=1)
+    return streak
+
+
+def random_history(today):
+    # Mostly runs of consecutive days ending near today, with gaps, a chance of
+    # a future day (clock skew) and out-of-order delivery.
+    days = set()
+    cursor = today - datetime.timedelta(days=random.randint(-1, 30))
+    for _ in range(random.randint(0, 6)):
+        for _ in range(random.randint(1, 10)):
+            days.add(cursor)
+            cursor -= datetime.timedelta(days=1)
+        cursor -= datetime.timedelta(days=random.randint(1, 5))
+    days = sorted(days)
+    if days and random.random() < 0.2:
+        random.shuffle(days)
+    return [day.isoformat() for day in days]
+
+
+def as_dict(activity):
+    # The {"YYYY-MM-DD": count} form get_streak() and the old commands read.
+    return {datetime.date.fromordinal(day).isoformat(): count for day, count in activity.items()}
+
+
+def old_top_streaks(data):
+    streaks = []
+    for user_id in data:
+        streak_count = get_streak(data[user_id].get("activity", {}))
+        if streak_count > 0:
+            streaks.append((user_id, streak_count))
+    return sorted(streaks, key=lambda x: x[1], reverse=True)[:10]
+
+
+def bench(users, repeat):
+    today = datetime.datetime.utcnow().date()
+    with tempfile.TemporaryDirectory() as directory:
+        backend = JsonBackend(os.path.join(directory, "data.json"), os.path.join(directory, "data.journal"))
+
+        async def populate():
+            for i in range(users):
+                user_id = str(i)
+                user = backend._user("1", user_id)
+                for date in sorted(random_history(today)):
+                    user["activity"].set(datetime.date.fromisoformat(date).toordinal(), 1)
+                    advance_streak(user, date)
+                backend.partitions["1"].streaks.update(user_id, user["streak"])
+            return await backend.top_streaks("1", 10)
+
+        indexed = asyncio.run(populate())
+        legacy = {user_id: {"activity": as_dict(user["activity"])} for user_id, user in backend.data["1"].items()}
+        assert indexed == old_top_streaks(legacy)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            old_top_streaks(legacy)
+        old = (time.perf_counter() - start) / repeat
+
+        async def lookups():
+            start = time.perf_counter()
+            for _ in range(repeat * 100):
+                await backend.top_streaks("1", 10)
+            return (time.perf_counter() - start) / (repeat * 100)
+
+        new = asyncio.run(lookups())
+    return old, new
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark top_streaks from maintained streak state against get_streak() scans.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    for users in args.sizes:
+        old, new = bench(users, args.repeat)
+        print(f"users={users:<8} get_streak scan {old * 1e3:10.2f} ms   index {new * 1e6:8.1f} us   ({old / new:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import JsonBackend
+from throttle import SolveThrottle
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+
+class FakeMessage:
+    """Stands in for discord.Message; each REST call sleeps for `rest_latency`."""
+
+    def __init__(self, message_id, channel, rest):
+        self.id = message_id
+        self.channel = channel
+        self.rest = rest
+
+    async def reply(self, content):
+        await self.rest.call("reply")
+
+    async def add_reaction(self, emoji):
+        await self.rest.call("add_reaction")
+
+
+class FakeRest:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = {}
+
+    async def call(self, route):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        await asyncio.sleep(self.latency)
+
+
+class CountingBackend(JsonBackend):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.updates = 0
+
+    async def record_solve(self, guild_id, user_id, count=1, now=None):
+        self.updates += 1
+        await super().record_solve(guild_id, user_id, count, now)
+
+
+def make_traffic(args):
+    # Bursts: a user pastes `burst` snippets a couple of seconds apart.
+    rng = random.Random(0)
+    traffic = []
+    for i in range(args.messages // args.burst):
+        user_id = str(rng.randrange(args.users))
+        channel = FakeChannel(rng.randrange(args.channels))
+        start = rng.uniform(0, args.duration)
+        traffic += [(start + j * args.gap, user_id, channel, i * args.burst + j) for j in range(args.burst)]
+    traffic.sort(key=lambda item: item[0])
+    return traffic
+
+
+async def replay(traffic, handle, speedup):
+    began = time.perf_counter()
+    for at, user_id, channel, message_id in traffic:
+        delay = at / speedup - (time.perf_counter() - began)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await handle(user_id, channel, message_id)
+
+
+async def run_old(directory, traffic, args):
+    backend = CountingBackend(os.path.join(directory, "old.json"), os.path.join(directory, "old.journal"))
+    rest = FakeRest(args.rest_latency)
+
+    async def handle(user_id, channel, message_id):
+        # The previous on_message: one update and one reply per code block.
+        await backend.record_solve("guild", user_id)
+        await FakeMessage(message_id, channel, rest).reply("Excellent work!")
+
+    began = time.perf_counter()
+    await replay(traffic, handle, args.speedup)
+    elapsed = time.perf_counter() - began
+    return rest.calls, backend.updates, await total(backend), elapsed
+
+
+async def run_throttled(directory, traffic, args):
+    backend = CountingBackend(os.path.join(directory, "new.json"), os.path.join(directory, "new.journal"))
+    rest = FakeRest(args.rest_latency)
+    # Windows are scaled with the replay so the coalescing matches real time.
+    throttle = SolveThrottle(backend, window=args.window / args.speedup, channel_limit=args.channel_limit, ack=args.ack)
+
+    async def handle(user_id, channel, message_id):
+        await throttle.credit("guild", user_id, FakeMessage(message_id, channel, rest))
+
+    began = time.perf_counter()
+    await replay(traffic, handle, args.speedup)
+    elapsed = time.perf_counter() - began
+    await throttle.flush()
+    return rest.calls, backend.updates, await total(backend), elapsed, throttle.stats()
+
+
+async def total(backend):
+    return sum(user["problems_solved"] for _, user in await backend.top_solvers("guild", 10**9))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="REST calls and state updates per credited code block, with and without SolveThrottle.")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=5, help="code blocks per user burst")
+    parser.add_argument("--gap", type=float, default=2.0, help="seconds between blocks in a burst")
+    parser.add_argument("--duration", type=float, default=600.0, help="simulated seconds of traffic")
+    parser.add_argument("--speedup", type=float, default=100.0, help="replay this many times faster than real time")
+    parser.add_argument("--rest-latency", type=float, default=0.0)
+    parser.add_argument("--window", type=float, default=10.0)
+    parser.add_argument("--channel-limit", type=int, default=5)
+    parser.add_argument("--ack", choices=("reaction", "reply"), default="reaction")
+    args = parser.parse_args()
+
+    traffic = make_traffic(args)
+    print(f"credited blocks={len(traffic)} users={args.users} channels={args.channels} burst={args.burst}x every {args.gap}s window={args.window}s")
+    with tempfile.TemporaryDirectory() as directory:
+        calls, updates, solved, elapsed = asyncio.run(run_old(directory, traffic, args))
+        print(f"per block:  REST {sum(calls.values()):6} {calls}  state updates {updates:6}  solves {solved}  ({elapsed:.2f}s)")
+        old_rest = sum(calls.values())
+        calls, updates, solved, elapsed, stats = asyncio.run(run_throttled(directory, traffic, args))
+        print(f"throttled:  REST {sum(calls.values()):6} {calls}  state updates {updates:6}  solves {solved}  ({elapsed:.2f}s)")
+        print(f"suppressed {stats['suppressed']} REST calls ({old_rest / max(sum(calls.values()), 1):.1f}x fewer)")
+        assert solved == len(traffic), (solved, len(traffic))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import time
+
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+APPLICATION_ID = 1000
+BOT_ID = 1001
+TIMESTAMP = "2024-01-01T00:00:00+00:00"
+LARGE_THRESHOLD = 250
+CHUNK_SIZE = 1000
+
+
+def user_payload(user_id, bot=False):
+    return {"id": str(user_id), "username": f"user{user_id}", "global_name": None, "avatar": None, "discriminator": "0", "bot": bot}
+
+
+def member_payload(user_id):
+    return {"user": user_payload(user_id), "roles": [], "joined_at": TIMESTAMP, "deaf": False, "mute": False, "flags": 0}
+
+
+def channel_id(guild_id):
+    return guild_id + 1
+
+
+def guild_payload(guild_id, member_ids):
+    # Like Discord, a large guild's GUILD_CREATE only carries the bot's own
+    # member; the rest arrive as GUILD_MEMBERS_CHUNK on request.
+    large = len(member_ids) + 1 > LARGE_THRESHOLD
+    members = [member_payload(BOT_ID)] + ([] if large else [member_payload(user_id) for user_id in member_ids])
+    members[0]["user"]["bot"] = True
+    return {
+        "id": str(guild_id), "name": f"guild{guild_id}", "owner_id": str(BOT_ID), "unavailable": False,
+        "member_count": len(member_ids) + 1, "large": large, "members": members, "joined_at": TIMESTAMP,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "68608", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False, "flags": 0}],
+        "channels": [{"id": str(channel_id(guild_id)), "type": 0, "name": "general", "position": 0, "permission_overwrites": []}],
+        "system_channel_id": str(channel_id(guild_id)), "features": [], "emojis": [], "stickers": [], "threads": [],
+        "voice_states": [], "presences": [], "stage_instances": [], "guild_scheduled_events": [],
+    }
+
+
+def message_create(message_id, guild_id, user_id, content):
+    return json.dumps({"op": 0, "t": "MESSAGE_CREATE", "s": message_id, "d": {
+        "id": str(message_id), "channel_id": str(channel_id(guild_id)), "guild_id": str(guild_id), "content": content,
+        "author": user_payload(user_id), "member": {"roles": [], "joined_at": TIMESTAMP, "deaf": False, "mute": False, "flags": 0},
+        "attachments": [], "embeds": [], "mentions": [], "mention_roles": [], "pinned": False, "tts": False,
+        "timestamp": TIMESTAMP, "edited_timestamp": None, "mention_everyone": False, "type": 0, "flags": 0,
+    }})
+
+
+def interaction_create(interaction_id, guild_id, user_id, name, options=()):
+    return json.dumps({"op": 0, "t": "INTERACTION_CREATE", "s": interaction_id, "d": {
+        "id": str(interaction_id), "application_id": str(APPLICATION_ID), "type": 2, "token": f"token{interaction_id}", "version": 1,
+        "guild_id": str(guild_id), "channel_id": str(channel_id(guild_id)),
+        "channel": {"id": str(channel_id(guild_id)), "type": 0, "guild_id": str(guild_id), "name": "general", "position": 0, "permission_overwrites": []},
+        "member": {**member_payload(user_id), "permissions": "68608"}, "app_permissions": "68608",
+        "locale": "en-US", "guild_locale": "en-US", "entitlements": [], "authorizing_integration_owners": {}, "context": 0,
+        "data": {"id": str(APPLICATION_ID + 1), "name": name, "type": 1,
+                 "options": [{"name": key, "type": 3, "value": value} for key, value in options]},
+    }})
+
+
+def message_payload(message_id, channel, content=""):
+    return {"id": str(message_id), "channel_id": str(channel), "author": user_payload(BOT_ID, bot=True), "content": content,
+            "timestamp": TIMESTAMP, "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [],
+            "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0, "flags": 0}
+
+
+class FakeRest:
+    """Replaces HTTPClient.request and the interaction webhook adapter: counts
+    calls per route, sleeps `latency` per call and answers with minimal
+    payloads."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._ids = 10**15
+
+    def _count(self, key):
+        self.calls[key] = self.calls.get(key, 0) + 1
+
+    async def request(self, route, **kwargs):
+        self._count(route.key)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if route.method == "POST" and route.path == "/channels/{channel_id}/messages":
+            self._ids += 1
+            return message_payload(self._ids, route.channel_id, (kwargs.get("json") or {}).get("content", ""))
+        if route.method == "GET" and route.path == "/users/{user_id}":
+            return user_payload(int(route.url.rsplit("/", 1)[1]))
+        if route.method == "PUT" and route.path.endswith("/commands"):
+            return []
+        return None
+
+    def install(self, bot):
+        bot.http.request = self.request
+        rest = self
+
+        class Adapter(AsyncWebhookAdapter):
+            async def request(self, route, session, **kwargs):
+                rest._count(f"{route.method} interaction callback")
+                if rest.latency:
+                    await asyncio.sleep(rest.latency)
+                return {"interaction": {"id": route.url.split("/interactions/")[1].split("/")[0], "type": 2}}
+
+        async_context.set(Adapter())
+
+
+class FakeGateway:
+    """Feeds gateway payloads to a bot's ConnectionState and answers member
+    requests (startup chunking and query_members) from `members`, a dict of
+    guild_id -> list of member user IDs. Time spent building and encoding
+    chunk payloads, which Discord would do, is kept in `encode_seconds`."""
+
+    def __init__(self, bot, members):
+        self.bot = bot
+        self.state = bot._connection
+        self.members = members
+        self.chunk_requests = 0
+        self.chunked_members = 0
+        self.encode_seconds = 0.0
+        self._member_sets = {}
+        self.state._get_websocket = lambda guild_id=None, *, shard_id=None: self
+
+    def receive(self, raw):
+        message = json.loads(raw)
+        getattr(self.state, "parse_" + message["t"].lower())(message["d"])
+
+    async def request_chunks(self, guild_id, query=None, *, limit, user_ids=None, presences=False, nonce=None):
+        self.chunk_requests += 1
+        asyncio.get_running_loop().create_task(self._send_chunks(guild_id, user_ids, nonce))
+
+    async def _send_chunks(self, guild_id, user_ids, nonce):
+        members = self.members.get(int(guild_id), [])
+        if user_ids is not None:
+            if guild_id not in self._member_sets:
+                self._member_sets[guild_id] = set(members)
+            members = [user_id for user_id in user_ids if user_id in self._member_sets[guild_id]]
+        count = max(1, -(-len(members) // CHUNK_SIZE))
+        for index in range(count):
+            # Yield first, as a network round trip would, so query_members()
+            # is already waiting when the reply arrives.
+            await asyncio.sleep(0)
+            chunk = members[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+            self.chunked_members += len(chunk)
+            started = time.perf_counter()
+            raw = json.dumps({"op": 0, "t": "GUILD_MEMBERS_CHUNK", "d": {
+                "guild_id": str(guild_id), "members": [member_payload(user_id) for user_id in chunk],
+                "chunk_index": index, "chunk_count": count, "nonce": nonce, "not_found": [],
+            }})
+            self.encode_seconds += time.perf_counter() - started
+            self.receive(raw)
+
+    async def connect(self, ready_timeout=0.05):
+        # READY with every guild unavailable, then one GUILD_CREATE per guild,
+        # as Discord sends them. Returns seconds until on_ready, less the
+        # ready timeout and the time spent encoding chunks.
+        began = time.perf_counter()
+        await self.bot._async_setup_hook()
+        self.state.guild_ready_timeout = ready_timeout
+        self.receive(json.dumps({"op": 0, "t": "READY", "d": {
+            "v": 10, "user": user_payload(BOT_ID, bot=True), "session_id": "session", "resume_gateway_url": "wss://gateway.invalid",
+            "guilds": [{"id": str(guild_id), "unavailable": True} for guild_id in self.members],
+            "application": {"id": str(APPLICATION_ID), "flags": 0},
+        }}))
+        for guild_id, member_ids in self.members.items():
+            self.receive(json.dumps({"op": 0, "t": "GUILD_CREATE", "d": guild_payload(guild_id, member_ids)}))
+            await asyncio.sleep(0)
+        await self.bot.wait_until_ready()
+        return time.perf_counter() - began - ready_timeout - self.encode_seconds
@@ -0,0 +1,80 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from state_service import STATE_SOCKET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def service_ready(socket_path):
+    # The socket file can outlive a killed service, so only a connection counts.
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(socket_path)
+    except OSError:
+        return False
+    return True
+
+
+def worker_env(worker, workers, shard_count, socket_path, base_port):
+    return {
+        **os.environ,
+        "STORAGE_BACKEND": "remote",
+        "STATE_SOCKET": socket_path,
+        "SHARD_COUNT": str(shard_count),
+        "SHARD_IDS": ",".join(str(shard_id) for shard_id in range(worker, shard_count, workers)),
+        "PORT": str(base_port + worker),
+        "REMINDER_FILE": f"reminders-{worker}.json",
+    }
+
+
+def main():
+    # WORKERS bot processes split SHARD_COUNT shards between them; one state
+    # service process owns the data (STORAGE_BACKEND picks its backend).
+    workers = int(os.getenv("WORKERS", "2"))
+    shard_count = int(os.getenv("SHARD_COUNT", str(workers)))
+    socket_path = os.path.abspath(os.getenv("STATE_SOCKET", STATE_SOCKET))
+    base_port = int(os.getenv("PORT", "8080"))
+
+    if service_ready(socket_path):
+        raise RuntimeError(f"A state service is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    # The service gets its own session so a terminal Ctrl-C, which reaches the
+    # whole process group, stops only the workers; it is stopped after they
+    # have flushed their pending solves into it.
+    service = subprocess.Popen([sys.executable, os.path.join(HERE, "state_service.py")], env={**os.environ, "STATE_SOCKET": socket_path},
+                               start_new_session=True)
+    while not service_ready(socket_path):
+        if service.poll() is not None:
+            raise RuntimeError("State service exited during startup")
+        time.sleep(0.1)
+
+    # SIGTERM to the cluster shuts down in the same order as Ctrl-C.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    processes = [subprocess.Popen([sys.executable, os.path.join(HERE, "main.py")], env=worker_env(i, workers, shard_count, socket_path, base_port))
+                 for i in range(workers)]
+    try:
+        while all(process.poll() is None for process in processes + [service]):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # A second signal must not skip stopping the service.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        # The service writes its final snapshot on SIGTERM.
+        service.terminate()
+        service.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import collections
+
+FENCE = "```"
+
+CodeBlock = collections.namedtuple("CodeBlock", ["language", "code"])
+
+
+def has_code_block(content):
+    # Same answer as re.search(r"```(.|\n)*```", content): an opening fence
+    # followed, without overlapping it, by another fence. Two str.find calls
+    # instead of a backtracking regex, and messages without a fence stop at
+    # the first one.
+    start = content.find(FENCE)
+    return start != -1 and content.find(FENCE, start + len(FENCE)) != -1
+
+
+def scan_code_blocks(content):
+    blocks = []
+    position = 0
+    while True:
+        start = content.find(FENCE, position)
+        if start == -1:
+            break
+        end = content.find(FENCE, start + len(FENCE))
+        if end == -1:
+            break
+        body = content[start + len(FENCE):end]
+        language = ""
+        first_line, newline, rest = body.partition("\n")
+        if newline and first_line.strip() and " " not in first_line.strip():
+            language = first_line.strip().lower()
+            body = rest
+        blocks.append(CodeBlock(language, body))
+        position = end + len(FENCE)
+    return blocks
@@ -1,41 +1,42 @@
 import discord
-import re
 import os
 import asyncio
 import random
-import json
+import signal
 from discord.ext import commands, tasks
 from collections import defaultdict
-from typing import Optional
+from typing import Literal, Optional
 import datetime
-
-TOKEN = os.getenv("TOKEN")
-OWNER_ID = int(os.getenv("OWNER_ID"))
-
-if not TOKEN:
-    raise ValueError("Bot token is missing! Set it in Replit's Secrets.")
-
-intents = discord.Intents.default()
-intents.messages = True
-intents.message_content = True
-intents.guilds = True
-intents.members = True
-
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-DATA_FILE = "data.json"
-
-def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as file:
-            return json.load(file)
-    return {}
-
-def save_data(data):
-    with open(DATA_FILE, "w") as file:
-        json.dump(data, file, indent=4)
-
-data = load_data()
+from storage import DM_GUILD, LEGACY_GUILD, open_backend
+from members import MemberCache
+from resolver import UserResolver
+from reminders import REMINDER_FILE, REMINDER_INTERVAL, ReminderScheduler
+from codeblock import has_code_block
+from throttle import SolveThrottle
+from persistence import LoopLagMonitor
+from webserver import start_webserver
+import metrics
+from metrics import timed
+
+def make_intents():
+    intents = discord.Intents.default()
+    intents.messages = True
+    intents.message_content = True
+    intents.guilds = True
+    intents.members = True
+    return intents
+
+class FlushSolvesOnClose:
+    async def close(self):
+        # Credit solves still waiting in a coalescing window before going offline.
+        await self.solves.flush()
+        await super().close()
+
+class BhabhiBot(FlushSolvesOnClose, commands.Bot):
+    pass
+
+class ShardedBhabhiBot(FlushSolvesOnClose, commands.AutoShardedBot):
+    pass
 
 def create_embed(title, description="", color=0x7289da, thumbnail=None, footer_text=None):
     embed = discord.Embed(title=title, description=description, color=color, timestamp=datetime.datetime.utcnow())
@@ -45,351 +46,428 @@ def create_embed(title, description="", color=0x7289da, thumbnail=None, footer_t
         embed.set_footer(text=footer_text)
     return embed
 
-def get_streak(activity):
-    if not activity:
-        return 0
-    today = datetime.datetime.utcnow().date()
-    active_dates = set(datetime.date.fromisoformat(date) for date in activity)
-    if not active_dates:
-        return 0
-    most_recent = max(active_dates)
-    streak = 0
-    current_date = most_recent
-    while current_date in active_dates and current_date <= today:
-        streak += 1
-        current_date -= datetime.timedelta(days=1)
-    return streak
-
-@bot.event
-async def on_ready():
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s).")
-    except Exception as e:
-        print(f"Error syncing commands: {e}")
-    print(f'Logged in as {bot.user}')
-    if not auto_reminder.is_running():
-        auto_reminder.start()
-
-@bot.event
-async def on_message(message):
-    if message.author == bot.user:
-        return
-
-    user_id = str(message.author.id)
-
-    if user_id not in data:
-        data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-
-    if re.search(r"```(.|\n)*```", message.content):
-        current_date = datetime.datetime.utcnow().date().isoformat()
-        if "activity" not in data[user_id]:
-            data[user_id]["activity"] = {}
-        if current_date not in data[user_id]["activity"]:
-            data[user_id]["activity"][current_date] = 0
-        data[user_id]["activity"][current_date] += 1
-        data[user_id]["problems_solved"] += 1
-        data[user_id]["last_active"] = datetime.datetime.utcnow().isoformat()
-        save_data(data)
-        await message.reply("Excellent work! Your coding progress has been recorded.")
-
-    await bot.process_commands(message)
-
-@tasks.loop(hours=24)
-async def auto_reminder():
-    current_time = datetime.datetime.utcnow()
-    for guild in bot.guilds:
-        for member in guild.members:
-            if member.bot:
-                continue
-            user_id = str(member.id)
-            user_data = data.get(user_id, {})
-            last_active_str = user_data.get("last_active", "Never")
-            if last_active_str == "Never":
-                last_active = None
+def guild_key(guild):
+    return str(guild.id) if guild is not None else DM_GUILD
+
+def create_bot(storage, owner_id=None, shard_ids=None, shard_count=None, reminder_file=REMINDER_FILE, solve_window=10.0, solve_channel_acks=5, solve_ack="reaction",
+               lean_members=False, member_cache_size=5000):
+    # Builds a bot with every event and command registered, without logging in.
+    # The storage, throttle, member cache, resolver, reminders and lag monitor
+    # it uses are attached to it as attributes.
+    options = {}
+    if lean_members:
+        # Guilds are not chunked at startup and discord.py caches no members;
+        # MemberCache keeps up to member_cache_size who interacted with the bot.
+        options = {"chunk_guilds_at_startup": False, "member_cache_flags": discord.MemberCacheFlags.none()}
+    if shard_ids is not None:
+        # One worker process of a cluster.py deployment; state lives in the state service.
+        bot = ShardedBhabhiBot(command_prefix="!", intents=make_intents(), owner_id=owner_id, shard_ids=shard_ids, shard_count=shard_count, **options)
+    else:
+        bot = BhabhiBot(command_prefix="!", intents=make_intents(), owner_id=owner_id, **options)
+
+    bot.storage = storage
+    bot.solves = solves = SolveThrottle(storage, window=solve_window, channel_limit=solve_channel_acks, ack=solve_ack)
+    bot.members = members = MemberCache(member_cache_size if lean_members else 0)
+    bot.resolver = resolver = UserResolver(bot, members=members)
+    bot.reminders = reminders = ReminderScheduler(reminder_file)
+    bot.loop_lag = loop_lag = LoopLagMonitor()
+
+    metrics.callback("bhabhibot_loop_lag_seconds", "Event-loop wake-up lag.", lambda: {key: value for key, value in loop_lag.stats().items() if key != "samples"}, label="stat")
+    metrics.callback("bhabhibot_user_resolver_total", "User resolver cache activity.", lambda: {key: value for key, value in resolver.stats().items() if key != "size"}, label="result", kind="counter")
+    metrics.callback("bhabhibot_reminders_sent_total", "Reminder messages sent.", lambda: reminders.sent, kind="counter")
+    metrics.callback("bhabhibot_member_cache_total", "Member cache lookups and gateway member requests.", lambda: {key: value for key, value in members.stats().items() if key != "size"}, label="result", kind="counter")
+    metrics.callback("bhabhibot_solve_throttle_total", "Code-block credits and how they were acknowledged and stored.", solves.stats, label="result", kind="counter")
+
+    @bot.event
+    async def on_ready():
+        try:
+            synced = await bot.tree.sync()
+            print(f"Synced {len(synced)} command(s).")
+        except Exception as e:
+            print(f"Error syncing commands: {e}")
+        print(f'Logged in as {bot.user}')
+        storage.start()
+        loop_lag.start()
+        if not auto_reminder.is_running():
+            auto_reminder.start()
+
+    @bot.event
+    @timed(metrics.ON_MESSAGE_SECONDS)
+    async def on_message(message):
+        if message.author == bot.user:
+            return
+
+        metrics.MESSAGES_SCANNED.inc()
+        members.remember(message.author)
+        user_id = str(message.author.id)
+        guild_id = guild_key(message.guild)
+
+        await storage.ensure_user(guild_id, user_id)
+
+        if has_code_block(message.content):
+            metrics.CODE_BLOCKS.inc()
+            reminders.touch(guild_id, user_id, datetime.datetime.utcnow())
+            await solves.credit(guild_id, user_id, message)
+
+        await bot.process_commands(message)
+
+    @bot.event
+    async def on_interaction(interaction):
+        members.remember(interaction.user)
+
+    @bot.event
+    async def on_raw_member_remove(payload):
+        members.forget(payload.guild_id, payload.user.id)
+
+    legacy_lock = asyncio.Lock()
+    legacy_users = None
+
+    async def adopt_legacy(guild):
+        # Pre-guild records move into a guild as soon as its member list is
+        # known, so its rankings include them. Unchunked (lean) guilds keep
+        # adopting on each member's first activity.
+        nonlocal legacy_users
+        if not guild.chunked:
+            return
+        async with legacy_lock:
+            if legacy_users is None:
+                legacy_users = set(await storage.legacy_users())
+            if len(guild.members) < len(legacy_users):
+                user_ids = [str(member.id) for member in guild.members if str(member.id) in legacy_users]
             else:
-                last_active = datetime.datetime.fromisoformat(last_active_str.split("+")[0])
-            if last_active and (current_time - last_active).total_seconds() > 86400:
-                channel = guild.system_channel or next(
-                    (ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages), None)
-                if channel:
-                    try:
-                        await channel.send(f"{member.mention}, we noticed you haven't shared code recently. Keep up your learning journey!")
-                    except discord.Forbidden:
-                        print(f"Missing permissions to send message in {channel.name}")
-                    except Exception as e:
-                        print(f"Error sending reminder: {e}")
-
-@bot.tree.command(name="send", description="Send a message to a channel (Admin only)")
-@commands.has_permissions(administrator=True)
-async def send(interaction: discord.Interaction, message: str):
-    await interaction.response.send_message(message)
-
-@bot.tree.command(name="help", description="Displays the list of available commands")
-async def help_command(interaction: discord.Interaction):
-    embed = create_embed("Available Commands", "Here are the commands you can use to enhance your coding journey:", thumbnail=bot.user.avatar.url, footer_text="Explore and enhance your coding skills!")
-    commands_list = [
-        ("/leaderboard", "View the top coders in the community based on problems solved."),
-        ("/stats", "Check your own or another user's coding progress and activity."),
-        ("/motivate [@user]", "Send a motivational message to a specified user."),
-        ("/streak", "Display your current coding streak (consecutive days active)."),
-        ("/top_streaks", "Show the top 10 users with the longest coding streaks."),
-        ("/set_goal [number]", "Set or unset a personal goal for problems to solve."),
-        ("/progress", "View your progress towards your goal and recent activity."),
-        ("/daily_puzzle", "Participate in a daily coding-related puzzle to boost your skills."),
-        ("/send [message]", "Send a message to a channel (Admin only)."),
-        ("/modify_solves [@user] [amount]", "Adjust a user's problem solve count (Admin only)."),
-        ("/user_report [@user]", "Generate a detailed activity report for a user (Admin only)."),
-    ]
-    for cmd, desc in commands_list:
-        embed.add_field(name=cmd, value=desc, inline=False)
-    await interaction.response.send_message(embed=embed)
-
-
-@bot.tree.command(name="motivate", description="Send a friendly motivation boost to someone")
-async def motivate(interaction: discord.Interaction, member: discord.Member):
-    async with interaction.channel.typing():
-        motivations = [
-            {
-                "message": f"{member.mention}, every programmer starts with fundamental concepts. Your commitment to learning and persistent efforts are highly commendable. Continue to strive for excellence.",
-                "color": 0xFFD700,  # Gold
-                "title": "Motivational Boost",
-                "gif": "https://media.giphy.com/media/v1.Y2lkPTc5MGI3NjExbmR1amdjaG12NGhrdnJkaGNmcmYyd2lvOWhmazl0aGVyOHVzeXF6dCZlcD12MV9naWZzX3NlYXJjaCZjdD1n/o75ajIFH0QnQC3nCeD/giphy.gif"
-            },
-            {
-                "message": f"{member.mention}, your proficiency in coding is notable. We encourage you to contribute your expertise to the community.",
-                "color": 0xFF4500,  # OrangeRed
-                "title": "Coding Encouragement",
-                "gif": "https://media.giphy.com/media/LmNwrBhejkK9EFP504/giphy.gif"
-            },
-            {
-                "message": f"{member.mention}, your passion for coding is apparent, and your advancements are significant. Maintain your exemplary performance.",
-                "color": 0x00FF00,  # Lime
-                "title": "Progress Acknowledgment",
-                "gif": "https://media.giphy.com/media/26tn33aiTi1jkl6H6/giphy.gif"
-            },
-            {
-                "message": f"{member.mention}, effectively addressing those technical challenges is a remarkable accomplishment. Excellent work, and persist in your endeavors.",
-                "color": 0x8A2BE2,  # BlueViolet
-                "title": "Achievement Recognition",
-                "gif": "https://media1.giphy.com/media/v1.Y2lkPTc5MGI3NjExZ3Frem0waGw3eW1zamF6MjJweWJpeXNzZTAwY3Q0cTZxdHplYmNkYyZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/oYQRuoYd6btVNAh75z/giphy.gif"
-            },
-            {
-                "message": f"{member.mention}, take a brief respite with a coffee, then resume your coding pursuits. It is important to remain refreshed and dedicated to continuous learning.",
-                "color": 0x6F4E37,  # Coffee brown
-                "title": "Learning Reminder",
-                "gif": "https://media.giphy.com/media/3o7TKUM3IgJBX2as9O/giphy.gif"
-            }
+                user_ids = [user_id for user_id in legacy_users if guild.get_member(int(user_id)) is not None]
+            if not user_ids:
+                return
+            await storage.adopt(guild_key(guild), user_ids)
+            legacy_users.difference_update(user_ids)
+        for user_id in user_ids:
+            reminders.adopt(guild_key(guild), user_id)
+
+    @bot.event
+    async def on_guild_available(guild):
+        await adopt_legacy(guild)
+
+    @bot.event
+    async def on_guild_join(guild):
+        await adopt_legacy(guild)
+
+    @tasks.loop(seconds=REMINDER_INTERVAL.total_seconds())
+    async def auto_reminder():
+        if not reminders.loaded:
+            # Only this process's guilds, plus pre-guild records that any of them may adopt.
+            reminders.load(await storage.last_active_all([str(guild.id) for guild in bot.guilds] + [LEGACY_GUILD]))
+        # Passes are dated by their slot in the schedule rather than by when
+        # they woke up, so consecutive passes are exactly one interval apart.
+        slot = auto_reminder.next_iteration
+        await reminders.run(bot.guilds, now=(slot - REMINDER_INTERVAL).replace(tzinfo=None) if slot else None, members=members)
+
+    @auto_reminder.before_loop
+    async def resume_reminder_schedule():
+        # The loop's first pass would otherwise run on every start.
+        await asyncio.sleep(reminders.until_next_pass())
+
+    @bot.tree.command(name="send", description="Send a message to a channel (Admin only)")
+    @commands.has_permissions(administrator=True)
+    @timed(metrics.COMMAND_SECONDS, "send")
+    async def send(interaction: discord.Interaction, message: str):
+        await interaction.response.send_message(message)
+
+    @bot.tree.command(name="help", description="Displays the list of available commands")
+    @timed(metrics.COMMAND_SECONDS, "help")
+    async def help_command(interaction: discord.Interaction):
+        embed = create_embed("Available Commands", "Here are the commands you can use to enhance your coding journey:", thumbnail=bot.user.avatar.url, footer_text="Explore and enhance your coding skills!")
+        commands_list = [
+            ("/leaderboard [scope]", "View the top coders in this server, or across all servers, based on problems solved."),
+            ("/stats", "Check your own or another user's coding progress and activity."),
+            ("/motivate [@user]", "Send a motivational message to a specified user."),
+            ("/streak", "Display your current coding streak (consecutive days active)."),
+            ("/top_streaks", "Show the top 10 users with the longest coding streaks."),
+            ("/set_goal [number]", "Set or unset a personal goal for problems to solve."),
+            ("/progress", "View your progress towards your goal and recent activity."),
+            ("/daily_puzzle", "Participate in a daily coding-related puzzle to boost your skills."),
+            ("/send [message]", "Send a message to a channel (Admin only)."),
+            ("/modify_solves [@user] [amount]", "Adjust a user's problem solve count (Admin only)."),
+            ("/user_report [@user]", "Generate a detailed activity report for a user (Admin only)."),
         ]
+        for cmd, desc in commands_list:
+            embed.add_field(name=cmd, value=desc, inline=False)
+        await interaction.response.send_message(embed=embed)
 
-        motivation = random.choice(motivations)
-
-        embed = discord.Embed(title=motivation["title"],
-                              description=motivation["message"],
-                              color=motivation["color"],
-                              timestamp=datetime.datetime.utcnow())
-
-        embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
-
-        embed.set_image(url=motivation["gif"])
-
-        embed.set_footer(
-            text="Keep striving for excellence in your coding journey.",
-            icon_url=interaction.user.avatar.url if interaction.user.avatar else interaction.user.default_avatar.url
-        )
 
+    @bot.tree.command(name="motivate", description="Send a friendly motivation boost to someone")
+    @timed(metrics.COMMAND_SECONDS, "motivate")
+    async def motivate(interaction: discord.Interaction, member: discord.Member):
+        async with interaction.channel.typing():
+            motivations = [
+                {
+                    "message": f"{member.mention}, every programmer starts with fundamental concepts. Your commitment to learning and persistent efforts are highly commendable. Continue to strive for excellence.",
+                    "color": 0xFFD700,  # Gold
+                    "title": "Motivational Boost",
+                    "gif": "https://media.giphy.com/media/v1.Y2lkPTc5MGI3NjExbmR1amdjaG12NGhrdnJkaGNmcmYyd2lvOWhmazl0aGVyOHVzeXF6dCZlcD12MV9naWZzX3NlYXJjaCZjdD1n/o75ajIFH0QnQC3nCeD/giphy.gif"
+                },
+                {
+                    "message": f"{member.mention}, your proficiency in coding is notable. We encourage you to contribute your expertise to the community.",
+                    "color": 0xFF4500,  # OrangeRed
+                    "title": "Coding Encouragement",
+                    "gif": "https://media.giphy.com/media/LmNwrBhejkK9EFP504/giphy.gif"
+                },
+                {
+                    "message": f"{member.mention}, your passion for coding is apparent, and your advancements are significant. Maintain your exemplary performance.",
+                    "color": 0x00FF00,  # Lime
+                    "title": "Progress Acknowledgment",
+                    "gif": "https://media.giphy.com/media/26tn33aiTi1jkl6H6/giphy.gif"
+                },
+                {
+                    "message": f"{member.mention}, effectively addressing those technical challenges is a remarkable accomplishment. Excellent work, and persist in your endeavors.",
+                    "color": 0x8A2BE2,  # BlueViolet
+                    "title": "Achievement Recognition",
+                    "gif": "https://media1.giphy.com/media/v1.Y2lkPTc5MGI3NjExZ3Frem0waGw3eW1zamF6MjJweWJpeXNzZTAwY3Q0cTZxdHplYmNkYyZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/oYQRuoYd6btVNAh75z/giphy.gif"
+                },
+                {
+                    "message": f"{member.mention}, take a brief respite with a coffee, then resume your coding pursuits. It is important to remain refreshed and dedicated to continuous learning.",
+                    "color": 0x6F4E37,  # Coffee brown
+                    "title": "Learning Reminder",
+                    "gif": "https://media.giphy.com/media/3o7TKUM3IgJBX2as9O/giphy.gif"
+                }
+            ]
+
+            motivation = random.choice(motivations)
+
+            embed = discord.Embed(title=motivation["title"],
+                                  description=motivation["message"],
+                                  color=motivation["color"],
+                                  timestamp=datetime.datetime.utcnow())
+
+            embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
+
+            embed.set_image(url=motivation["gif"])
+
+            embed.set_footer(
+                text="Keep striving for excellence in your coding journey.",
+                icon_url=interaction.user.avatar.url if interaction.user.avatar else interaction.user.default_avatar.url
+            )
+
+            await interaction.response.send_message(embed=embed)
+
+
+    @bot.tree.command(name="leaderboard", description="Displays the coding leaderboard")
+    @timed(metrics.COMMAND_SECONDS, "leaderboard")
+    async def leaderboard(interaction: discord.Interaction, scope: Literal["server", "global"] = "server"):
+        async with interaction.channel.typing():
+            if scope == "global":
+                sorted_users = await storage.global_top_solvers(10)
+            else:
+                sorted_users = await storage.top_solvers(guild_key(interaction.guild), 10)
+            embed = create_embed("🏆 Top Coders Leaderboard", "The best problem solvers:", color=0xFFD700, thumbnail="https://cdn-icons-png.flaticon.com/512/888/888859.png", footer_text="Climb the ranks by solving more problems!")
+            users = await resolver.resolve_many([user_id for user_id, _ in sorted_users], interaction.guild)
+            for rank, (user_id, stats) in enumerate(sorted_users, 1):
+                user = users[int(user_id)]
+                medal = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else ""
+                embed.add_field(name=f"{medal} {rank}. {user.display_name}", value=f"**Solved:** {stats['problems_solved']} | **Last Active:** {stats['last_active'][:10]}", inline=False)
+            await interaction.response.send_message(embed=embed)
+
+    @bot.tree.command(name="stats", description="View coding statistics for yourself or another user")
+    @timed(metrics.COMMAND_SECONDS, "stats")
+    async def stats(interaction: discord.Interaction, member: Optional[discord.Member] = None):
+        async with interaction.channel.typing():
+            target = member or interaction.user
+            user_id = str(target.id)
+            guild_id = guild_key(interaction.guild)
+            user_data = await storage.get_user(guild_id, user_id)
+            rank = await storage.rank(guild_id, user_id)
+            last_active = user_data["last_active"]
+            if last_active != "Never":
+                last_active = datetime.datetime.fromisoformat(last_active).strftime('%Y-%m-%d %H:%M')
+            embed = create_embed(f"📊 {target.display_name}'s Coding Stats", thumbnail=target.avatar.url if target.avatar else target.default_avatar.url, footer_text="Keep up the great work!")
+            embed.add_field(name="Problems Solved", value=f"```{user_data['problems_solved']}```", inline=True)
+            embed.add_field(name="Leaderboard Rank", value=f"```{rank}```", inline=True)
+            embed.add_field(name="Last Active", value=f"```{last_active}```", inline=True)
+            embed.add_field(name="Activity Level", value=f"```{'🔥 Active' if last_active != 'Never' else '❄️ Inactive'}```", inline=True)
+            await interaction.response.send_message(embed=embed)
+
+    @bot.tree.command(name="modify_solves", description="[ADMIN] Adjust a user's solved problems count")
+    @commands.has_permissions(administrator=True)
+    @timed(metrics.COMMAND_SECONDS, "modify_solves")
+    async def modify_solves(interaction: discord.Interaction, member: discord.Member, amount: int):
+        if amount == 0:
+            await interaction.response.send_message("The adjustment amount cannot be zero.", ephemeral=True)
+            return
+        user_id = str(member.id)
+        guild_id = guild_key(interaction.guild)
+        original_count = (await storage.get_user(guild_id, user_id))["problems_solved"]
+        new_count = max(0, original_count + amount)
+        await storage.set_solves(guild_id, user_id, new_count)
+        embed = create_embed("Admin Action: Problem Count Adjustment", f"Updated {member.mention}'s problem solve count:", thumbnail=member.avatar.url if member.avatar else member.default_avatar.url, footer_text=f"Action performed by {interaction.user.display_name}")
+        embed.add_field(name="Previous Count", value=f"```{original_count}```", inline=True)
+        embed.add_field(name="Adjustment", value=f"```{'+' if amount > 0 else ''}{amount}```", inline=True)
+        embed.add_field(name="New Count", value=f"```{new_count}```", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @modify_solves.error
+    async def modify_solves_error(interaction: discord.Interaction, error):
+        if isinstance(error, commands.MissingPermissions):
+            await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An error occurred: {str(error)}", ephemeral=True)
+
+    @bot.tree.command(name="streak", description="Shows your current coding streak")
+    @timed(metrics.COMMAND_SECONDS, "streak")
+    async def streak(interaction: discord.Interaction):
+        user_id = str(interaction.user.id)
+        guild_id = guild_key(interaction.guild)
+        await storage.ensure_user(guild_id, user_id)
+        streak_count = await storage.streak(guild_id, user_id)
+        embed = create_embed("Your Coding Streak", thumbnail=interaction.user.avatar.url if interaction.user.avatar else interaction.user.default_avatar.url, footer_text="Keep the streak alive!")
+        embed.add_field(name="Current Streak", value=f"```{streak_count} days```", inline=True)
         await interaction.response.send_message(embed=embed)
 
+    @bot.tree.command(name="top_streaks", description="Shows the top 10 users with the longest coding streaks")
+    @timed(metrics.COMMAND_SECONDS, "top_streaks")
+    async def top_streaks(interaction: discord.Interaction):
+        top_streaks = await storage.top_streaks(guild_key(interaction.guild), 10)
+        embed = create_embed("Top Coding Streaks", thumbnail="https://cdn-icons-png.flaticon.com/512/4096/4096148.png", footer_text="Consistency is key!")
+        users = await resolver.resolve_many([user_id for user_id, _ in top_streaks], interaction.guild)
+        for rank, (user_id, streak_count) in enumerate(top_streaks, 1):
+            user = users[int(user_id)]
+            embed.add_field(name=f"{rank}. {user.display_name}", value=f"```{streak_count} days```", inline=False)
+        if not top_streaks:
+            embed.description = "No active streaks yet. Start coding to build your streak!"
+        await interaction.response.send_message(embed=embed)
 
-@bot.tree.command(name="leaderboard", description="Displays the coding leaderboard")
-async def leaderboard(interaction: discord.Interaction):
-    async with interaction.channel.typing():
-        sorted_users = sorted(data.items(), key=lambda x: x[1].get("problems_solved", 0), reverse=True)[:10]
-        embed = create_embed("🏆 Top Coders Leaderboard", "The best problem solvers:", color=0xFFD700, thumbnail="https://cdn-icons-png.flaticon.com/512/888/888859.png", footer_text="Climb the ranks by solving more problems!")
-        for rank, (user_id, stats) in enumerate(sorted_users, 1):
-            user = await bot.fetch_user(int(user_id))
-            medal = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else ""
-            embed.add_field(name=f"{medal} {rank}. {user.display_name}", value=f"**Solved:** {stats['problems_solved']} | **Last Active:** {stats['last_active'][:10]}", inline=False)
+    @bot.tree.command(name="set_goal", description="Set your personal goal for problems to solve")
+    @timed(metrics.COMMAND_SECONDS, "set_goal")
+    async def set_goal(interaction: discord.Interaction, number: int):
+        if number < 0:
+            await interaction.response.send_message("Goal must be a non-negative integer.", ephemeral=True)
+            return
+        user_id = str(interaction.user.id)
+        await storage.set_goal(guild_key(interaction.guild), user_id, number)
+        if number == 0:
+            await interaction.response.send_message("Your goal has been unset.", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"Your goal has been set to {number} problems.", ephemeral=True)
+
+    @bot.tree.command(name="progress", description="Shows your progress towards your goal and recent activity")
+    @timed(metrics.COMMAND_SECONDS, "progress")
+    async def progress(interaction: discord.Interaction):
+        user_id = str(interaction.user.id)
+        guild_id = guild_key(interaction.guild)
+        user_data = await storage.get_user(guild_id, user_id)
+        problems_solved = user_data["problems_solved"]
+        goal = user_data.get("goal", 0)
+        today = datetime.datetime.utcnow().date()
+        recent_activity = await storage.activity_since(guild_id, user_id, today - datetime.timedelta(days=6))
+        embed = create_embed("Your Coding Progress", thumbnail=interaction.user.avatar.url if interaction.user.avatar else interaction.user.default_avatar.url, footer_text="Track your progress daily!")
+        embed.add_field(name="Total Problems Solved", value=f"```{problems_solved}```", inline=True)
+        if goal > 0:
+            progress_percentage = (problems_solved / goal) * 100
+            embed.add_field(name="Goal Progress", value=f"```{problems_solved} / {goal} ({progress_percentage:.1f}%)```", inline=True)
+        else:
+            embed.add_field(name="Goal", value="```Not set```", inline=True)
+        embed.add_field(name="Last 7 Days", value=f"```{recent_activity}```", inline=True)
         await interaction.response.send_message(embed=embed)
 
-@bot.tree.command(name="stats", description="View coding statistics for yourself or another user")
-async def stats(interaction: discord.Interaction, member: Optional[discord.Member] = None):
-    async with interaction.channel.typing():
-        target = member or interaction.user
-        user_id = str(target.id)
-        if user_id not in data:
-            data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-        sorted_users = sorted(data.items(), key=lambda x: x[1].get("problems_solved", 0), reverse=True)
-        user_ids = [uid for uid, _ in sorted_users]
-        rank = user_ids.index(user_id) + 1 if user_id in user_ids else len(user_ids) + 1
-        last_active = data[user_id]["last_active"] if data[user_id]["last_active"] != "Never" else "Never"
-        if last_active != "Never":
-            last_active = datetime.datetime.fromisoformat(last_active).strftime('%Y-%m-%d %H:%M')
-        embed = create_embed(f"📊 {target.display_name}'s Coding Stats", thumbnail=target.avatar.url if target.avatar else target.default_avatar.url, footer_text="Keep up the great work!")
-        embed.add_field(name="Problems Solved", value=f"```{data[user_id]['problems_solved']}```", inline=True)
-        embed.add_field(name="Leaderboard Rank", value=f"```{rank}```", inline=True)
-        embed.add_field(name="Last Active", value=f"```{last_active}```", inline=True)
-        embed.add_field(name="Activity Level", value=f"```{'🔥 Active' if last_active != 'Never' else '❄️ Inactive'}```", inline=True)
+    @bot.tree.command(name="daily_puzzle", description="Participate in a daily coding-related puzzle")
+    @timed(metrics.COMMAND_SECONDS, "daily_puzzle")
+    async def daily_puzzle(interaction: discord.Interaction):
+        user_id = str(interaction.user.id)
+        guild_id = guild_key(interaction.guild)
+        await storage.ensure_user(guild_id, user_id)
+
+        today = datetime.datetime.utcnow().date()
+
+        # Code blocks still in a coalescing window count as today's activity too.
+        if solves.pending(guild_id, user_id, today) or await storage.activity_since(guild_id, user_id, today) > 0:
+            embed = create_embed("Daily Puzzle", "You've already participated in today's puzzle!", thumbnail="https://cdn-icons-png.flaticon.com/512/4096/4096148.png", footer_text="Sharpen your mind daily!")
+            embed.add_field(name="Status", value="```🔒 Done```", inline=True)
+        else:
+            await storage.record_solve(guild_id, user_id)
+            reminders.touch(guild_id, user_id, datetime.datetime.utcnow())
+
+            puzzles = [
+                "What is the time complexity of a binary search algorithm?",
+                "Explain the difference between '==' and '===' in JavaScript.",
+                "How would you reverse a string in Python without using built-in functions?"
+            ]
+            puzzle = random.choice(puzzles)
+
+            embed = create_embed("Daily Puzzle", f"**Today's Puzzle:**\n{puzzle}", thumbnail="https://cdn-icons-png.flaticon.com/512/4096/4096148.png", footer_text="Sharpen your mind daily!")
+            embed.add_field(name="Status", value="```✅ Active```", inline=True)
+
         await interaction.response.send_message(embed=embed)
 
-@bot.tree.command(name="modify_solves", description="[ADMIN] Adjust a user's solved problems count")
-@commands.has_permissions(administrator=True)
-async def modify_solves(interaction: discord.Interaction, member: discord.Member, amount: int):
-    if amount == 0:
-        await interaction.response.send_message("The adjustment amount cannot be zero.", ephemeral=True)
-        return
-    user_id = str(member.id)
-    if user_id not in data:
-        data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-    original_count = data[user_id]["problems_solved"]
-    data[user_id]["problems_solved"] = max(0, data[user_id]["problems_solved"] + amount)
-    save_data(data)
-    embed = create_embed("Admin Action: Problem Count Adjustment", f"Updated {member.mention}'s problem solve count:", thumbnail=member.avatar.url if member.avatar else member.default_avatar.url, footer_text=f"Action performed by {interaction.user.display_name}")
-    embed.add_field(name="Previous Count", value=f"```{original_count}```", inline=True)
-    embed.add_field(name="Adjustment", value=f"```{'+' if amount > 0 else ''}{amount}```", inline=True)
-    embed.add_field(name="New Count", value=f"```{data[user_id]['problems_solved']}```", inline=True)
-    await interaction.response.send_message(embed=embed, ephemeral=True)
-
-@modify_solves.error
-async def modify_solves_error(interaction: discord.Interaction, error):
-    if isinstance(error, commands.MissingPermissions):
-        await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
-    else:
-        await interaction.response.send_message(f"An error occurred: {str(error)}", ephemeral=True)
-
-@bot.tree.command(name="streak", description="Shows your current coding streak")
-async def streak(interaction: discord.Interaction):
-    user_id = str(interaction.user.id)
-    if user_id not in data:
-        data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-    activity = data[user_id].get("activity", {})
-    streak_count = get_streak(activity)
-    embed = create_embed("Your Coding Streak", thumbnail=interaction.user.avatar.url if interaction.user.avatar else interaction.user.default_avatar.url, footer_text="Keep the streak alive!")
-    embed.add_field(name="Current Streak", value=f"```{streak_count} days```", inline=True)
-    await interaction.response.send_message(embed=embed)
-
-@bot.tree.command(name="top_streaks", description="Shows the top 10 users with the longest coding streaks")
-async def top_streaks(interaction: discord.Interaction):
-    streaks = []
-    for user_id in data:
-        activity = data[user_id].get("activity", {})
-        streak_count = get_streak(activity)
-        if streak_count > 0:
-            streaks.append((user_id, streak_count))
-    top_streaks = sorted(streaks, key=lambda x: x[1], reverse=True)[:10]
-    embed = create_embed("Top Coding Streaks", thumbnail="https://cdn-icons-png.flaticon.com/512/4096/4096148.png", footer_text="Consistency is key!")
-    for rank, (user_id, streak_count) in enumerate(top_streaks, 1):
-        user = await bot.fetch_user(int(user_id))
-        embed.add_field(name=f"{rank}. {user.display_name}", value=f"```{streak_count} days```", inline=False)
-    if not top_streaks:
-        embed.description = "No active streaks yet. Start coding to build your streak!"
-    await interaction.response.send_message(embed=embed)
-
-@bot.tree.command(name="set_goal", description="Set your personal goal for problems to solve")
-async def set_goal(interaction: discord.Interaction, number: int):
-    if number < 0:
-        await interaction.response.send_message("Goal must be a non-negative integer.", ephemeral=True)
-        return
-    user_id = str(interaction.user.id)
-    if user_id not in data:
-        data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-    if number == 0:
-        data[user_id]["goal"] = 0
-        await interaction.response.send_message("Your goal has been unset.", ephemeral=True)
-    else:
-        data[user_id]["goal"] = number
-        await interaction.response.send_message(f"Your goal has been set to {number} problems.", ephemeral=True)
-    save_data(data)
-
-@bot.tree.command(name="progress", description="Shows your progress towards your goal and recent activity")
-async def progress(interaction: discord.Interaction):
-    user_id = str(interaction.user.id)
-    if user_id not in data:
-        data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-    problems_solved = data[user_id]["problems_solved"]
-    goal = data[user_id].get("goal", 0)
-    activity = data[user_id].get("activity", {})
-    today = datetime.datetime.utcnow().date()
-    last_7_days = [(today - datetime.timedelta(days=i)).isoformat() for i in range(7)]
-    recent_activity = sum(activity.get(date, 0) for date in last_7_days)
-    embed = create_embed("Your Coding Progress", thumbnail=interaction.user.avatar.url if interaction.user.avatar else interaction.user.default_avatar.url, footer_text="Track your progress daily!")
-    embed.add_field(name="Total Problems Solved", value=f"```{problems_solved}```", inline=True)
-    if goal > 0:
-        progress_percentage = (problems_solved / goal) * 100
-        embed.add_field(name="Goal Progress", value=f"```{problems_solved} / {goal} ({progress_percentage:.1f}%)```", inline=True)
-    else:
-        embed.add_field(name="Goal", value="```Not set```", inline=True)
-    embed.add_field(name="Last 7 Days", value=f"```{recent_activity}```", inline=True)
-    await interaction.response.send_message(embed=embed)
-
-@bot.tree.command(name="daily_puzzle", description="Participate in a daily coding-related puzzle")
-async def daily_puzzle(interaction: discord.Interaction):
-    user_id = str(interaction.user.id)
-    if user_id not in data:
-        data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-
-    current_date = datetime.datetime.utcnow().date().isoformat()
-    activity = data[user_id].get("activity", {})
-
-    if current_date in activity and activity[current_date] > 0:
-        embed = create_embed("Daily Puzzle", "You've already participated in today's puzzle!", thumbnail="https://cdn-icons-png.flaticon.com/512/4096/4096148.png", footer_text="Sharpen your mind daily!")
-        embed.add_field(name="Status", value="```🔒 Done```", inline=True)
-    else:
-        if "activity" not in data[user_id]:
-            data[user_id]["activity"] = {}
-        if current_date not in data[user_id]["activity"]:
-            data[user_id]["activity"][current_date] = 0
-        data[user_id]["activity"][current_date] += 1
-        data[user_id]["problems_solved"] += 1
-        data[user_id]["last_active"] = datetime.datetime.utcnow().isoformat()
-        save_data(data)
-
-        puzzles = [
-            "What is the time complexity of a binary search algorithm?",
-            "Explain the difference between '==' and '===' in JavaScript.",
-            "How would you reverse a string in Python without using built-in functions?"
-        ]
-        puzzle = random.choice(puzzles)
-
-        embed = create_embed("Daily Puzzle", f"**Today's Puzzle:**\n{puzzle}", thumbnail="https://cdn-icons-png.flaticon.com/512/4096/4096148.png", footer_text="Sharpen your mind daily!")
-        embed.add_field(name="Status", value="```✅ Active```", inline=True)
-
-    await interaction.response.send_message(embed=embed)
-
-@bot.tree.command(name="user_report", description="[ADMIN] Generate a detailed activity report for a user")
-@commands.has_permissions(administrator=True)
-async def user_report(interaction: discord.Interaction, member: discord.Member):
-    user_id = str(member.id)
-    if user_id not in data:
-        data[user_id] = {"problems_solved": 0, "last_active": "Never", "activity": {}, "goal": 0}
-
-    problems_solved = data[user_id]["problems_solved"]
-    activity = data[user_id].get("activity", {})
-    streak_count = get_streak(activity)
-    goal = data[user_id].get("goal", 0)
-    last_active = data[user_id]["last_active"] if data[user_id]["last_active"] != "Never" else "Never"
-
-    today = datetime.datetime.utcnow().date()
-    last_30_days = [(today - datetime.timedelta(days=i)).isoformat() for i in range(30)]
-    recent_activity = sum(activity.get(date, 0) for date in last_30_days)
-
-    embed = create_embed(f"Activity Report for {member.display_name}", thumbnail=member.avatar.url if member.avatar else member.default_avatar.url, footer_text=f"Report generated by {interaction.user.display_name}")
-    embed.add_field(name="Total Problems Solved", value=f"```{problems_solved}```", inline=True)
-    embed.add_field(name="Current Streak", value=f"```{streak_count} days```", inline=True)
-    if goal > 0:
-        progress_percentage = (problems_solved / goal) * 100
-        embed.add_field(name="Goal Progress", value=f"```{problems_solved} / {goal} ({progress_percentage:.1f}%)```", inline=True)
-    else:
-        embed.add_field(name="Goal", value="```Not set```", inline=True)
-    embed.add_field(name="Last Active", value=f"```{last_active[:10]}```" if last_active != "Never" else "```Never```", inline=True)
-    embed.add_field(name="Last 30 Days", value=f"```{recent_activity}```", inline=True)
-    await interaction.response.send_message(embed=embed, ephemeral=True)
-
-@user_report.error
-async def user_report_error(interaction: discord.Interaction, error):
-    if isinstance(error, commands.MissingPermissions):
-        await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
-    else:
-        await interaction.response.send_message(f"An error occurred: {str(error)}", ephemeral=True)
+    @bot.tree.command(name="user_report", description="[ADMIN] Generate a detailed activity report for a user")
+    @commands.has_permissions(administrator=True)
+    @timed(metrics.COMMAND_SECONDS, "user_report")
+    async def user_report(interaction: discord.Interaction, member: discord.Member):
+        user_id = str(member.id)
+        guild_id = guild_key(interaction.guild)
+        user_data = await storage.get_user(guild_id, user_id)
+
+        problems_solved = user_data["problems_solved"]
+        streak_count = await storage.streak(guild_id, user_id)
+        goal = user_data.get("goal", 0)
+        last_active = user_data["last_active"]
+
+        today = datetime.datetime.utcnow().date()
+        recent_activity = await storage.activity_since(guild_id, user_id, today - datetime.timedelta(days=29))
+
+        embed = create_embed(f"Activity Report for {member.display_name}", thumbnail=member.avatar.url if member.avatar else member.default_avatar.url, footer_text=f"Report generated by {interaction.user.display_name}")
+        embed.add_field(name="Total Problems Solved", value=f"```{problems_solved}```", inline=True)
+        embed.add_field(name="Current Streak", value=f"```{streak_count} days```", inline=True)
+        if goal > 0:
+            progress_percentage = (problems_solved / goal) * 100
+            embed.add_field(name="Goal Progress", value=f"```{problems_solved} / {goal} ({progress_percentage:.1f}%)```", inline=True)
+        else:
+            embed.add_field(name="Goal", value="```Not set```", inline=True)
+        embed.add_field(name="Last Active", value=f"```{last_active[:10]}```" if last_active != "Never" else "```Never```", inline=True)
+        embed.add_field(name="Last 30 Days", value=f"```{recent_activity}```", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @user_report.error
+    async def user_report_error(interaction: discord.Interaction, error):
+        if isinstance(error, commands.MissingPermissions):
+            await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An error occurred: {str(error)}", ephemeral=True)
+
+    bot.auto_reminder = auto_reminder
+    return bot
+
+async def run_bot(bot, token):
+    # bot.run() without its signal handling gap: SIGTERM (cluster.py, service
+    # managers) goes through bot.close() like Ctrl-C, so open solve windows are flushed.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    async with bot:
+        await bot.start(token)
+
+def main():
+    token = os.getenv("TOKEN")
+    owner_id = int(os.getenv("OWNER_ID"))
+
+    if not token:
+        raise ValueError("Bot token is missing! Set it in Replit's Secrets.")
+
+    shard_ids = os.getenv("SHARD_IDS")
+    bot = create_bot(
+        open_backend(os.getenv("STORAGE_BACKEND", "json")),
+        owner_id=owner_id,
+        shard_ids=[int(shard_id) for shard_id in shard_ids.split(",")] if shard_ids else None,
+        shard_count=int(os.getenv("SHARD_COUNT")) if shard_ids else None,
+        reminder_file=os.getenv("REMINDER_FILE", REMINDER_FILE),
+        solve_window=float(os.getenv("SOLVE_WINDOW", "10")),
+        solve_channel_acks=int(os.getenv("SOLVE_CHANNEL_ACKS", "5")),
+        solve_ack=os.getenv("SOLVE_ACK", "reaction"),
+        lean_members=os.getenv("LEAN_MEMBERS", "0") == "1",
+        member_cache_size=int(os.getenv("MEMBER_CACHE_SIZE", "5000")),
+    )
+    start_webserver(bot, bot.loop_lag, int(os.getenv("PORT", "8080")))
+    discord.utils.setup_logging()
+    try:
+        asyncio.run(run_bot(bot, token))
+    except KeyboardInterrupt:
+        pass
+    bot.storage.close()
 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import collections
+
+import metrics
+
+QUERY_LIMIT = 100
+
+
+class MemberCache:
+    """Members of guilds the bot did not chunk at startup.
+
+    Members who interacted with the bot (messages, slash commands) are kept in
+    an LRU of at most `maxsize` entries; with maxsize=0 nothing is kept and
+    lookups go straight to the gateway cache, as when every guild is chunked.
+    resolve() falls back to a gateway member request for the given IDs, in
+    batches of QUERY_LIMIT, when the guild's own cache is incomplete."""
+
+    def __init__(self, maxsize=5000):
+        self.maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+        self.queried = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "queries": self.queries, "queried": self.queried,
+                "evictions": self.evictions, "size": len(self._cache)}
+
+    def remember(self, member):
+        if not self.maxsize or getattr(member, "guild", None) is None:
+            return
+        key = (member.guild.id, member.id)
+        self._cache[key] = member
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def forget(self, guild_id, user_id):
+        self._cache.pop((guild_id, user_id), None)
+
+    def get(self, guild, user_id):
+        member = self._cache.get((guild.id, user_id))
+        if member is not None:
+            self._cache.move_to_end((guild.id, user_id))
+            return member
+        return guild.get_member(user_id)
+
+    async def resolve(self, guild, user_ids):
+        # Returns {user_id: member} for those still in the guild.
+        resolved = {}
+        missing = []
+        for user_id in user_ids:
+            member = self.get(guild, user_id)
+            if member is not None:
+                self.hits += 1
+                resolved[user_id] = member
+            else:
+                self.misses += 1
+                missing.append(user_id)
+        # A chunked guild's cache is complete, so a miss there means the user left.
+        if not missing or guild.chunked:
+            return resolved
+        for start in range(0, len(missing), QUERY_LIMIT):
+            batch = missing[start:start + QUERY_LIMIT]
+            self.queries += 1
+            self.queried += len(batch)
+            metrics.MEMBER_QUERIES.inc()
+            try:
+                members = await guild.query_members(user_ids=batch, limit=len(batch), cache=False)
+            except Exception as e:
+                print(f"Error querying {len(batch)} member(s) of guild {guild.id}: {e}")
+                continue
+            for member in members:
+                resolved[member.id] = member
+        return resolved
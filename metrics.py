@@ -0,0 +1,143 @@
+import bisect
+import functools
+import math
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}
+
+    def inc(self, amount=1, label_value=""):
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def samples(self):
+        if not self._values and self.label is None:
+            yield self.name, {}, 0
+        for label_value, value in sorted(self._values.items()):
+            yield self.name, {self.label: label_value} if self.label else {}, value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, label_value=""):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for label_value, (counts, total, count) in sorted(self._series.items()):
+            labels = {self.label: label_value} if self.label else {}
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": repr(bound)}, cumulative
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class CallbackMetric:
+    """Gauge (or counter) whose value is read from `fn` at scrape time. `fn`
+    may return a number, or a dict of label value -> number."""
+
+    def __init__(self, name, help, fn, label=None, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.label = label
+        self.kind = kind
+
+    def samples(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            for label_value, item in sorted(value.items()):
+                yield self.name, {self.label: label_value}, item
+        else:
+            yield self.name, {}, value
+
+
+def counter(name, help, label=None):
+    metric = Counter(name, help, label)
+    REGISTRY.append(metric)
+    return metric
+
+
+def histogram(name, help, label=None, buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, help, label, buckets)
+    REGISTRY.append(metric)
+    return metric
+
+
+def callback(name, help, fn, label=None, kind="gauge"):
+    # Registering a name again (e.g. another create_bot()) replaces the old
+    # callback rather than exporting the family twice.
+    metric = CallbackMetric(name, help, fn, label, kind)
+    REGISTRY[:] = [existing for existing in REGISTRY if existing.name != name]
+    REGISTRY.append(metric)
+    return metric
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def timed(metric, label_value=""):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start, label_value)
+        return wrapper
+    return decorator
+
+
+COMMAND_SECONDS = histogram("bhabhibot_command_seconds", "Slash command handler latency.", label="command")
+ON_MESSAGE_SECONDS = histogram("bhabhibot_on_message_seconds", "on_message handler latency.")
+MESSAGES_SCANNED = counter("bhabhibot_messages_scanned_total", "Messages checked for code blocks.")
+CODE_BLOCKS = counter("bhabhibot_code_blocks_total", "Messages credited for containing a code block.")
+SAVES = counter("bhabhibot_saves_total", "Writes to persistent storage.", label="kind")
+REST_CALLS = counter("bhabhibot_rest_calls_total", "Discord REST calls made outside interaction responses.", label="route")
+REST_SUPPRESSED = counter("bhabhibot_rest_suppressed_total", "Discord REST calls skipped by coalescing.", label="route")
+MEMBER_QUERIES = counter("bhabhibot_member_queries_total", "Gateway member requests for users missing from the member cache.")
@@ -0,0 +1,121 @@
+import asyncio
+import collections
+import json
+import os
+import threading
+
+import metrics
+
+
+def write_json_atomic(path, obj, indent=None, default=None):
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w") as file:
+        json.dump(obj, file, indent=indent, default=default)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_file, path)
+
+
+class SnapshotWriter:
+    """Saves JSON snapshots off the event loop.
+
+    `save(snapshot)` takes a callable that returns a consistent copy of the
+    state; it is called on the loop right before the write, and the copy is
+    serialized and written (temp file + rename) in a worker thread. Requests
+    arriving while a write is in flight are coalesced into one follow-up
+    write that all of them wait on. `default` goes to json.dump, so objects
+    in the copy can turn themselves into JSON on the worker thread.
+
+    Writes are serialized, and a snapshot older than the one already on disk
+    is dropped, so a final save_sync() cannot be overwritten by a background
+    write that was still in flight."""
+
+    def __init__(self, path, indent=None, default=None):
+        self.path = path
+        self.indent = indent
+        self.default = default
+        self._write_lock = threading.Lock()
+        self._taken = 0
+        self._written = 0
+        self._snapshot = None
+        self._next = None
+        self._task = None
+        self.requests = 0
+        self.writes = 0
+
+    async def save(self, snapshot):
+        self.requests += 1
+        self._snapshot = snapshot
+        if self._next is None:
+            self._next = asyncio.get_running_loop().create_future()
+        future = self._next
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+        await asyncio.shield(future)
+
+    async def _drain(self):
+        while self._next is not None:
+            future, self._next = self._next, None
+            try:
+                self._taken += 1
+                await asyncio.to_thread(self._write, self._snapshot(), self._taken)
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
+
+    def save_sync(self, obj):
+        self._taken += 1
+        self._write(obj, self._taken)
+
+    def _write(self, obj, generation):
+        with self._write_lock:
+            if generation < self._written:
+                return
+            write_json_atomic(self.path, obj, self.indent, self.default)
+            self._written = generation
+        self.writes += 1
+        metrics.SAVES.inc(label_value="snapshot")
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task, which is how long
+    something else held the loop."""
+
+    def __init__(self, interval=0.25, window=2400, warn_after=0.5):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = collections.deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.warn_after:
+                print(f"Event loop was blocked for {lag:.3f}s")
+
+    def stats(self):
+        if not self.samples:
+            return {"samples": 0, "last": 0.0, "p50": 0.0, "p99": 0.0, "max": self.max_lag}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "last": self.samples[-1],
+            "p50": ordered[len(ordered) // 2],
+            "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+            "max": self.max_lag,
+        }
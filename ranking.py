@@ -0,0 +1,135 @@
+from bisect import bisect_left, insort
+
+
+class SortedIndex:
+    """Sorted multiset split into chunks of roughly `load` keys. A Fenwick tree
+    over the chunk sizes turns positional lookups into O(log n) operations."""
+
+    def __init__(self, keys=(), load=1000):
+        self._load = load
+        keys = sorted(keys)
+        self._lists = [keys[i:i + load] for i in range(0, len(keys), load)]
+        self._maxes = [chunk[-1] for chunk in self._lists]
+        self._len = len(keys)
+        self._build_tree()
+
+    def __len__(self):
+        return self._len
+
+    def _build_tree(self):
+        tree = [0] + [len(chunk) for chunk in self._lists]
+        for i in range(1, len(tree)):
+            j = i + (i & -i)
+            if j < len(tree):
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos, delta):
+        i = pos + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, pos):
+        total = 0
+        while pos > 0:
+            total += self._tree[pos]
+            pos -= pos & -pos
+        return total
+
+    def add(self, key):
+        self._len += 1
+        if not self._lists:
+            self._lists.append([key])
+            self._maxes.append(key)
+            self._build_tree()
+            return
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._lists[pos].append(key)
+            self._maxes[pos] = key
+        else:
+            insort(self._lists[pos], key)
+        self._tree_add(pos, 1)
+        chunk = self._lists[pos]
+        if len(chunk) > 2 * self._load:
+            self._lists.insert(pos + 1, chunk[self._load:])
+            del chunk[self._load:]
+            self._maxes[pos] = chunk[-1]
+            self._maxes.insert(pos + 1, self._lists[pos + 1][-1])
+            self._build_tree()
+
+    def remove(self, key):
+        pos = bisect_left(self._maxes, key)
+        chunk = self._lists[pos]
+        del chunk[bisect_left(chunk, key)]
+        self._len -= 1
+        if chunk:
+            self._maxes[pos] = chunk[-1]
+            self._tree_add(pos, -1)
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+            self._build_tree()
+
+    def index(self, key):
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            return self._len
+        return self._prefix(pos) + bisect_left(self._lists[pos], key)
+
+    def head(self, count):
+        result = []
+        for chunk in self._lists:
+            if len(result) >= count:
+                break
+            result.extend(chunk[:count - len(result)])
+        return result
+
+
+class RankIndex:
+    """Order-statistics index of users by descending score. Ties keep the order
+    in which users were first seen, matching a stable sort of the data dict."""
+
+    def __init__(self, scores=()):
+        self._keys = {}
+        self._seq = 0
+        for user_id, score in scores:
+            self._keys[user_id] = (-score, self._seq, user_id)
+            self._seq += 1
+        self._index = SortedIndex(self._keys.values())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return user_id in self._keys
+
+    def update(self, user_id, score):
+        old = self._keys.get(user_id)
+        if old is not None:
+            if old[0] == -score:
+                return
+            self._index.remove(old)
+            seq = old[1]
+        else:
+            seq = self._seq
+            self._seq += 1
+        key = (-score, seq, user_id)
+        self._keys[user_id] = key
+        self._index.add(key)
+
+    def discard(self, user_id):
+        key = self._keys.pop(user_id, None)
+        if key is not None:
+            self._index.remove(key)
+
+    def score(self, user_id):
+        return -self._keys[user_id][0]
+
+    def rank(self, user_id):
+        return self._index.index(self._keys[user_id]) + 1
+
+    def top(self, count):
+        return [(user_id, -score) for score, _, user_id in self._index.head(count)]
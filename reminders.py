@@ -0,0 +1,204 @@
+import asyncio
+import datetime
+import json
+import os
+import time
+
+import metrics
+from persistence import SnapshotWriter
+from ranking import SortedIndex
+from storage import LEGACY_GUILD, adopts_legacy
+
+REMINDER_FILE = "reminders.json"
+REMINDER_INTERVAL = datetime.timedelta(hours=24)
+MESSAGE_LIMIT = 2000
+REMINDER_TEXT = ", we noticed you haven't shared code recently. Keep up your learning journey!"
+
+
+def parse_last_active(value):
+    return datetime.datetime.fromisoformat(value.split("+")[0])
+
+
+def batch_mentions(mentions, suffix=REMINDER_TEXT, limit=MESSAGE_LIMIT):
+    batches = []
+    current = []
+    length = len(suffix)
+    for mention in mentions:
+        if current and length + len(mention) + 1 > limit:
+            batches.append(current)
+            current = []
+            length = len(suffix)
+        current.append(mention)
+        length += len(mention) + 1
+    if current:
+        batches.append(current)
+    return batches
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ReminderScheduler:
+    """Sends inactivity reminders without walking every guild member.
+
+    Tracked (guild, user) pairs are kept ordered by last activity, so a run
+    only visits the prefix that is past the threshold. Mentions are combined per guild channel
+    into as few messages as fit, sends go through a token bucket, and who was
+    reminded when (per guild) is checkpointed to disk so a restart neither
+    repeats nor skips reminders. The checkpoint also keeps when the last pass
+    completed, so after a restart the next one waits out the rest of
+    `interval` instead of running at once."""
+
+    def __init__(self, state_file=REMINDER_FILE, threshold=datetime.timedelta(hours=24), interval=REMINDER_INTERVAL,
+                 rate=0.5, burst=5, checkpoint_interval=5.0):
+        self.state_file = state_file
+        self.writer = SnapshotWriter(state_file)
+        self.threshold = threshold
+        self.interval = interval
+        self.checkpoint_interval = checkpoint_interval
+        self.bucket = TokenBucket(rate, burst)
+        self._index = SortedIndex()
+        self._last_active = {}
+        self._reminded = {}
+        self.last_pass = None
+        if os.path.exists(state_file):
+            with open(state_file, "r") as file:
+                state = json.load(file)
+            self._reminded = {key: datetime.datetime.fromisoformat(value) for key, value in state["reminded"].items()}
+            if state["last_pass"] is not None:
+                self.last_pass = datetime.datetime.fromisoformat(state["last_pass"])
+        self.loaded = False
+        self.sent = 0
+        self.mentioned = 0
+
+    def load(self, last_active_all):
+        # `last_active_all` is guild_id -> user_id -> timestamp, as storage returns it.
+        loaded = {(guild_id, user_id): parse_last_active(value)
+                  for guild_id, users in last_active_all.items() for user_id, value in users.items()}
+        # Activity touched before the first load is newer than what storage returned.
+        self._last_active = {**loaded, **self._last_active}
+        self._index = SortedIndex((when, guild_id, user_id) for (guild_id, user_id), when in self._last_active.items())
+        self.loaded = True
+
+    def until_next_pass(self, now=None):
+        # Seconds until the pass after the last completed one is due.
+        if self.last_pass is None:
+            return 0.0
+        now = now or datetime.datetime.utcnow()
+        return max(0.0, (self.last_pass + self.interval - now).total_seconds())
+
+    def touch(self, guild_id, user_id, when):
+        # Activity in a guild adopts the user's legacy record in storage too.
+        keys = ((LEGACY_GUILD, user_id), (guild_id, user_id)) if adopts_legacy(guild_id) else ((guild_id, user_id),)
+        for key in keys:
+            old = self._last_active.pop(key, None)
+            if old is not None:
+                self._index.remove((old, *key))
+        self._last_active[(guild_id, user_id)] = when
+        self._index.add((when, guild_id, user_id))
+
+    def adopt(self, guild_id, user_id):
+        # Storage moved the user's legacy record into `guild_id`; activity is unchanged.
+        when = self._last_active.pop((LEGACY_GUILD, user_id), None)
+        if when is not None:
+            self._index.remove((when, LEGACY_GUILD, user_id))
+            self._last_active[(guild_id, user_id)] = when
+            self._index.add((when, guild_id, user_id))
+
+    def due(self, now):
+        cutoff = now - self.threshold
+        # Equal timestamps are not past the threshold, so stop before them.
+        return [(guild_id, user_id) for _, guild_id, user_id in self._index.head(self._index.index((cutoff,)))]
+
+    def _recently_reminded(self, key, now):
+        reminded = self._reminded.get(key)
+        return reminded is not None and now - reminded < self.threshold
+
+    @staticmethod
+    def _channel(guild):
+        return guild.system_channel or next(
+            (ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages), None)
+
+    async def run(self, guilds, now=None, members=None):
+        # `members` (a MemberCache) looks up due users a guild has not cached;
+        # without it only guild.get_member() is consulted.
+        now = now or datetime.datetime.utcnow()
+        due = {}
+        for guild_id, user_id in self.due(now):
+            due.setdefault(guild_id, []).append(user_id)
+        # Pre-guild records are not tied to a guild yet, so they are checked
+        # against every guild the way all users used to be.
+        legacy = due.pop(LEGACY_GUILD, [])
+        last_checkpoint = time.monotonic()
+        for guild in guilds:
+            candidates = [int(user_id) for user_id in due.get(str(guild.id), [])
+                          if not self._recently_reminded(f"{guild.id}:{user_id}", now)]
+            legacy_candidates = [int(user_id) for user_id in legacy
+                                 if not self._recently_reminded(f"{guild.id}:{user_id}", now)]
+            if not candidates and not legacy_candidates:
+                continue
+            if members is not None:
+                found = await members.resolve(guild, candidates)
+                # Legacy users are only looked up in the caches: querying the
+                # gateway for all of them in every unchunked guild would cost a
+                # member request per 100 users per guild on every pass.
+                for user_id in legacy_candidates:
+                    member = members.get(guild, user_id)
+                    if member is not None:
+                        found[user_id] = member
+            else:
+                found = {user_id: guild.get_member(user_id) for user_id in candidates + legacy_candidates}
+            candidates += legacy_candidates
+            pending = []
+            for user_id in candidates:
+                member = found.get(user_id)
+                if member is None or member.bot:
+                    continue
+                pending.append((f"{guild.id}:{user_id}", member.mention))
+            if not pending:
+                continue
+            channel = self._channel(guild)
+            if channel is None:
+                continue
+            keys = dict((mention, key) for key, mention in pending)
+            for batch in batch_mentions([mention for _, mention in pending]):
+                await self.bucket.acquire()
+                metrics.REST_CALLS.inc(label_value="send_message")
+                try:
+                    await channel.send(" ".join(batch) + REMINDER_TEXT)
+                except Exception as e:
+                    print(f"Error sending reminder in {channel.name}: {e}")
+                    continue
+                self.sent += 1
+                self.mentioned += len(batch)
+                for mention in batch:
+                    self._reminded[keys[mention]] = now
+                if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    await self.save(now)
+                    last_checkpoint = time.monotonic()
+        self.last_pass = now
+        await self.save(now)
+
+    async def save(self, now=None):
+        now = now or datetime.datetime.utcnow()
+        # Entries older than the threshold no longer suppress anything.
+        self._reminded = {key: when for key, when in self._reminded.items() if now - when < self.threshold}
+        await self.writer.save(lambda: {
+            "last_pass": self.last_pass.isoformat() if self.last_pass else None,
+            "reminded": {key: when.isoformat() for key, when in self._reminded.items()},
+        })
@@ -0,0 +1,113 @@
+import asyncio
+import collections
+import time
+
+import metrics
+
+ResolvedUser = collections.namedtuple("ResolvedUser", ["display_name", "avatar_url"])
+
+UNKNOWN_USER = ResolvedUser("Unknown User", None)
+
+
+class UserResolver:
+    """Resolves user IDs to display names and avatars for embeds.
+
+    Lookups go through a TTL/LRU cache, then the gateway caches (guild members
+    and client.get_user), then a gateway member request when `members` (a
+    MemberCache) is given and the guild is not fully cached, and only then
+    REST, with at most `concurrency` fetch_user calls in flight."""
+
+    def __init__(self, client, ttl=600, maxsize=10000, concurrency=5, members=None):
+        self.client = client
+        self.members = members
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.gateway_hits = 0
+        self.fetches = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "gateway_hits": self.gateway_hits,
+                "fetches": self.fetches, "evictions": self.evictions, "size": len(self._cache)}
+
+    def _get_cached(self, user_id):
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return None
+        expires, resolved = entry
+        if expires < time.monotonic():
+            del self._cache[user_id]
+            return None
+        self._cache.move_to_end(user_id)
+        return resolved
+
+    def _store(self, user_id, resolved):
+        self._cache[user_id] = (time.monotonic() + self.ttl, resolved)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def _from_gateway(self, user_id, guild):
+        user = None
+        if guild is not None:
+            user = self.members.get(guild, user_id) if self.members is not None else guild.get_member(user_id)
+        if user is None:
+            user = self.client.get_user(user_id)
+        return user
+
+    @staticmethod
+    def _resolved(user):
+        # Global name, not the guild nickname, to match what fetch_user returns.
+        return ResolvedUser(user.global_name or user.name, user.display_avatar.url)
+
+    async def _fetch(self, user_id):
+        async with self._semaphore:
+            self.fetches += 1
+            metrics.REST_CALLS.inc(label_value="fetch_user")
+            try:
+                return await self.client.fetch_user(user_id)
+            except Exception as e:
+                print(f"Error fetching user {user_id}: {e}")
+                return None
+
+    async def resolve_many(self, user_ids, guild=None):
+        resolved = {}
+        missing = []
+        for user_id in user_ids:
+            user_id = int(user_id)
+            cached = self._get_cached(user_id)
+            if cached is not None:
+                self.hits += 1
+                resolved[user_id] = cached
+                continue
+            self.misses += 1
+            user = self._from_gateway(user_id, guild)
+            if user is not None:
+                self.gateway_hits += 1
+                resolved[user_id] = self._resolved(user)
+                self._store(user_id, resolved[user_id])
+            else:
+                missing.append(user_id)
+        if missing and guild is not None and self.members is not None:
+            queried = await self.members.resolve(guild, missing)
+            for user_id, member in queried.items():
+                self.gateway_hits += 1
+                resolved[user_id] = self._resolved(member)
+                self._store(user_id, resolved[user_id])
+            missing = [user_id for user_id in missing if user_id not in queried]
+        fetched = await asyncio.gather(*(self._fetch(user_id) for user_id in missing))
+        for user_id, user in zip(missing, fetched):
+            if user is None:
+                resolved[user_id] = UNKNOWN_USER
+            else:
+                resolved[user_id] = self._resolved(user)
+                self._store(user_id, resolved[user_id])
+        return resolved
+
+    async def resolve(self, user_id, guild=None):
+        return (await self.resolve_many([user_id], guild))[int(user_id)]
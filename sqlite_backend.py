@@ -0,0 +1,281 @@
+import asyncio
+import concurrent.futures
+import datetime
+import os
+import sqlite3
+
+import metrics
+
+from storage import DATA_FILE, JOURNAL_FILE, LEGACY_GUILD, ActivityStore, Backend, adopts_legacy, init_streak, streak_runs
+
+DB_FILE = "data.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    problems_solved INTEGER NOT NULL DEFAULT 0,
+    last_active TEXT NOT NULL DEFAULT 'Never',
+    goal INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    streak_day INTEGER,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS users_by_solves ON users (guild_id, problems_solved DESC);
+CREATE INDEX IF NOT EXISTS users_by_streak ON users (guild_id, streak DESC);
+CREATE INDEX IF NOT EXISTS users_by_user ON users (user_id);
+CREATE TABLE IF NOT EXISTS activity (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id, day)
+) WITHOUT ROWID;
+"""
+
+USER_COLUMNS = "problems_solved, last_active, goal, streak, longest_streak, streak_day"
+
+
+def _day(date):
+    return date.toordinal()
+
+
+class SqliteBackend(Backend):
+    """SQLite (WAL) backend. All statements run on one dedicated executor
+    thread that owns the connection, so the event loop never blocks on disk."""
+
+    def __init__(self, db_file=DB_FILE, data_file=DATA_FILE, journal_file=JOURNAL_FILE):
+        self.db_file = db_file
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn = None
+        self._known = set()
+        self._executor.submit(self._open, data_file, journal_file).result()
+
+    def _open(self, data_file, journal_file):
+        self._conn = sqlite3.connect(self.db_file)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        empty = self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+        if empty and (os.path.exists(data_file) or os.path.exists(journal_file)):
+            store = ActivityStore(data_file, journal_file)
+            migrate(self._conn, store.load())
+
+    def _streak_from_activity(self, guild_id, user_id):
+        days = [day for (day,) in self._conn.execute(
+            "SELECT day FROM activity WHERE guild_id = ? AND user_id = ? ORDER BY day", (guild_id, user_id))]
+        return (*streak_runs(days), days[-1] if days else None)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self):
+        self._executor.submit(self._conn.close).result()
+        self._executor.shutdown()
+
+    def _ensure(self, guild_id, user_id):
+        if self._conn.execute("SELECT 1 FROM users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)).fetchone():
+            return
+        # First sighting in this guild: adopt the user's pre-guild record if there is one.
+        adopted = 0
+        if adopts_legacy(guild_id):
+            self._conn.execute(
+                f"INSERT INTO users (guild_id, user_id, {USER_COLUMNS}) "
+                f"SELECT ?, user_id, {USER_COLUMNS} FROM users WHERE guild_id = ? AND user_id = ?",
+                (guild_id, LEGACY_GUILD, user_id))
+            adopted = self._conn.execute("SELECT changes()").fetchone()[0]
+        if adopted:
+            self._conn.execute("DELETE FROM users WHERE guild_id = ? AND user_id = ?", (LEGACY_GUILD, user_id))
+            self._conn.execute("UPDATE activity SET guild_id = ? WHERE guild_id = ? AND user_id = ?",
+                               (guild_id, LEGACY_GUILD, user_id))
+        else:
+            self._conn.execute("INSERT INTO users (guild_id, user_id) VALUES (?, ?)", (guild_id, user_id))
+
+    def _get_user(self, guild_id, user_id):
+        self._ensure(guild_id, user_id)
+        self._conn.commit()
+        row = self._conn.execute("SELECT problems_solved, last_active, goal FROM users WHERE guild_id = ? AND user_id = ?",
+                                 (guild_id, user_id)).fetchone()
+        return {"problems_solved": row[0], "last_active": row[1], "goal": row[2]}
+
+    async def get_user(self, guild_id, user_id):
+        self._known.add((guild_id, user_id))
+        return await self._run(self._get_user, guild_id, user_id)
+
+    def _ensure_commit(self, guild_id, user_id):
+        self._ensure(guild_id, user_id)
+        self._conn.commit()
+        metrics.SAVES.inc(label_value="sqlite")
+
+    async def ensure_user(self, guild_id, user_id):
+        # Users already created or read through this connection skip the executor hop.
+        if (guild_id, user_id) in self._known:
+            return
+        self._known.add((guild_id, user_id))
+        await self._run(self._ensure_commit, guild_id, user_id)
+
+    def _record_solve(self, guild_id, user_id, now, count):
+        with self._conn:
+            self._ensure(guild_id, user_id)
+            self._conn.execute(
+                "UPDATE users SET problems_solved = problems_solved + ?, "
+                "last_active = CASE WHEN last_active = 'Never' OR last_active < ? THEN ? ELSE last_active END "
+                "WHERE guild_id = ? AND user_id = ?",
+                (count, now.isoformat(), now.isoformat(), guild_id, user_id))
+            self._conn.execute(
+                "INSERT INTO activity (guild_id, user_id, day, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id, day) DO UPDATE SET count = count + excluded.count",
+                (guild_id, user_id, _day(now.date()), count))
+            self._advance_streak(guild_id, user_id, _day(now.date()))
+        metrics.SAVES.inc(label_value="sqlite")
+
+    def _advance_streak(self, guild_id, user_id, day):
+        streak, longest, last_day = self._conn.execute(
+            "SELECT streak, longest_streak, streak_day FROM users WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id)).fetchone()
+        if last_day is not None and day < last_day:
+            streak, longest, last_day = self._streak_from_activity(guild_id, user_id)
+        elif day != last_day:
+            streak = streak + 1 if last_day is not None and day == last_day + 1 else 1
+            longest = max(longest, streak)
+            last_day = day
+        self._conn.execute("UPDATE users SET streak = ?, longest_streak = ?, streak_day = ? WHERE guild_id = ? AND user_id = ?",
+                           (streak, longest, last_day, guild_id, user_id))
+
+    async def record_solve(self, guild_id, user_id, count=1, now=None):
+        self._known.add((guild_id, user_id))
+        await self._run(self._record_solve, guild_id, user_id, now or datetime.datetime.utcnow(), count)
+
+    def _set_column(self, column, guild_id, user_id, value):
+        with self._conn:
+            self._ensure(guild_id, user_id)
+            self._conn.execute(f"UPDATE users SET {column} = ? WHERE guild_id = ? AND user_id = ?", (value, guild_id, user_id))
+        metrics.SAVES.inc(label_value="sqlite")
+
+    async def set_solves(self, guild_id, user_id, problems_solved):
+        await self._run(self._set_column, "problems_solved", guild_id, user_id, problems_solved)
+
+    async def set_goal(self, guild_id, user_id, goal):
+        await self._run(self._set_column, "goal", guild_id, user_id, goal)
+
+    def _top_solvers(self, guild_id, limit):
+        rows = self._conn.execute(
+            "SELECT user_id, problems_solved, last_active, goal FROM users WHERE guild_id = ? "
+            "ORDER BY problems_solved DESC, rowid LIMIT ?",
+            (guild_id, limit)).fetchall()
+        return [(row[0], {"problems_solved": row[1], "last_active": row[2], "goal": row[3]}) for row in rows]
+
+    async def top_solvers(self, guild_id, limit):
+        return await self._run(self._top_solvers, guild_id, limit)
+
+    def _global_top_solvers(self, limit):
+        rows = self._conn.execute(
+            "SELECT user_id, SUM(problems_solved), MAX(CASE WHEN last_active = 'Never' THEN '' ELSE last_active END) "
+            "FROM users GROUP BY user_id ORDER BY SUM(problems_solved) DESC, MIN(rowid) LIMIT ?",
+            (limit,)).fetchall()
+        return [(row[0], {"problems_solved": row[1], "last_active": row[2] or "Never"}) for row in rows]
+
+    async def global_top_solvers(self, limit):
+        return await self._run(self._global_top_solvers, limit)
+
+    def _rank(self, guild_id, user_id):
+        self._ensure_commit(guild_id, user_id)
+        rowid, solved = self._conn.execute("SELECT rowid, problems_solved FROM users WHERE guild_id = ? AND user_id = ?",
+                                           (guild_id, user_id)).fetchone()
+        ahead = self._conn.execute(
+            "SELECT (SELECT COUNT(*) FROM users WHERE guild_id = ? AND problems_solved > ?) + "
+            "(SELECT COUNT(*) FROM users WHERE guild_id = ? AND problems_solved = ? AND rowid < ?)",
+            (guild_id, solved, guild_id, solved, rowid)).fetchone()[0]
+        return ahead + 1
+
+    async def rank(self, guild_id, user_id):
+        return await self._run(self._rank, guild_id, user_id)
+
+    def _activity_since(self, guild_id, user_id, since):
+        self._ensure_commit(guild_id, user_id)
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM activity WHERE guild_id = ? AND user_id = ? AND day BETWEEN ? AND ?",
+            (guild_id, user_id, _day(since), _day(datetime.datetime.utcnow().date()))).fetchone()[0]
+
+    async def activity_since(self, guild_id, user_id, since):
+        return await self._run(self._activity_since, guild_id, user_id, since)
+
+    def _streak(self, guild_id, user_id):
+        self._ensure_commit(guild_id, user_id)
+        row = self._conn.execute("SELECT streak, streak_day FROM users WHERE guild_id = ? AND user_id = ?",
+                                 (guild_id, user_id)).fetchone()
+        if row is None or row[1] is None or row[1] > _day(datetime.datetime.utcnow().date()):
+            return 0
+        return row[0]
+
+    async def streak(self, guild_id, user_id):
+        return await self._run(self._streak, guild_id, user_id)
+
+    def _top_streaks(self, guild_id, limit):
+        return self._conn.execute(
+            "SELECT user_id, streak FROM users WHERE guild_id = ? AND streak > 0 AND streak_day <= ? "
+            "ORDER BY streak DESC, rowid LIMIT ?",
+            (guild_id, _day(datetime.datetime.utcnow().date()), limit)).fetchall()
+
+    async def top_streaks(self, guild_id, limit):
+        return [tuple(row) for row in await self._run(self._top_streaks, guild_id, limit)]
+
+    def _last_active_all(self, guild_ids):
+        query = "SELECT guild_id, user_id, last_active FROM users WHERE last_active != 'Never'"
+        if guild_ids is None:
+            batches = [()]
+        else:
+            # Bound the number of host parameters per statement.
+            guild_ids = list(guild_ids)
+            batches = [guild_ids[start:start + 500] for start in range(0, len(guild_ids), 500)]
+        last_active = {}
+        for batch in batches:
+            sql = query if guild_ids is None else f"{query} AND guild_id IN ({', '.join('?' * len(batch))})"
+            for guild_id, user_id, value in self._conn.execute(sql, batch):
+                last_active.setdefault(guild_id, {})[user_id] = value
+        return last_active
+
+    async def last_active_all(self, guild_ids=None):
+        return await self._run(self._last_active_all, guild_ids)
+
+    def _legacy_users(self):
+        return [user_id for (user_id,) in self._conn.execute("SELECT user_id FROM users WHERE guild_id = ?", (LEGACY_GUILD,))]
+
+    async def legacy_users(self):
+        return await self._run(self._legacy_users)
+
+    def _adopt(self, guild_id, user_ids):
+        adopted = []
+        if not adopts_legacy(guild_id):
+            return adopted
+        with self._conn:
+            for user_id in user_ids:
+                if self._conn.execute("SELECT 1 FROM users WHERE guild_id = ? AND user_id = ?", (LEGACY_GUILD, user_id)).fetchone():
+                    self._ensure(guild_id, user_id)
+                    adopted.append(user_id)
+        metrics.SAVES.inc(label_value="sqlite")
+        return adopted
+
+    async def adopt(self, guild_id, user_ids):
+        adopted = await self._run(self._adopt, guild_id, list(user_ids))
+        self._known.update((guild_id, user_id) for user_id in adopted)
+
+
+def migrate(conn, data):
+    # `data` is ActivityStore's guild -> user -> record layout, activity as
+    # ActivitySeries (rolled-up weeks land on their Monday). Tolerates legacy
+    # records: missing goal and stray keys such as "rank".
+    with conn:
+        for guild_id, users in data.items():
+            for user_id, user in users.items():
+                if "streak" not in user:
+                    init_streak(user)
+                streak_day = user.get("streak_day")
+                conn.execute(
+                    f"INSERT OR REPLACE INTO users (guild_id, user_id, {USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (guild_id, user_id, int(user.get("problems_solved", 0)), user.get("last_active") or "Never", int(user.get("goal", 0)),
+                     user["streak"], user["longest_streak"], _day(datetime.date.fromisoformat(streak_day)) if streak_day else None))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO activity (guild_id, user_id, day, count) VALUES (?, ?, ?, ?)",
+                    [(guild_id, user_id, day, count) for day, count in user["activity"].items()])
@@ -0,0 +1,210 @@
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import signal
+
+from storage import Backend, open_backend
+
+STATE_SOCKET = "state.sock"
+# last_active_all() and wide leaderboards come back as a single line.
+LINE_LIMIT = 64 * 1024 * 1024
+
+METHODS = (
+    "get_user", "ensure_user", "record_solve", "set_solves", "set_goal", "top_solvers",
+    "global_top_solvers", "rank", "activity_since", "streak", "top_streaks", "last_active_all",
+    "legacy_users", "adopt",
+)
+
+
+def _record(user):
+    # Activity history stays in the service; commands only read these fields.
+    return {key: value for key, value in user.items() if key != "activity"}
+
+
+def _encode(method, result):
+    if method == "get_user":
+        return _record(result)
+    if method in ("top_solvers", "global_top_solvers"):
+        return [(user_id, _record(user)) for user_id, user in result]
+    return result
+
+
+class StateServer:
+    """Serves a Backend to bot worker processes over a Unix socket, one JSON
+    request per line.
+
+    Everything runs on this process's event loop and the in-memory backends
+    never await mid-update, so each request (a solve's count, activity and
+    streak together) is applied atomically without taking a lock. Disk writes
+    are left to the backend's own write-behind journal."""
+
+    def __init__(self, backend, path=STATE_SOCKET):
+        self.backend = backend
+        self.path = path
+        self.requests = 0
+        self._server = None
+        self._clients = {}
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.backend.start()
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=LINE_LIMIT)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in self._clients.values():
+            writer.close()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _call(self, method, args):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        if method == "activity_since":
+            args[-1] = datetime.date.fromisoformat(args[-1])
+        elif method == "record_solve" and args[-1] is not None:
+            args[-1] = datetime.datetime.fromisoformat(args[-1])
+        return _encode(method, await getattr(self.backend, method)(*args))
+
+    async def _handle(self, reader, writer):
+        self._clients[asyncio.current_task()] = writer
+        try:
+            while line := await reader.readline():
+                request = json.loads(line)
+                self.requests += 1
+                try:
+                    response = {"id": request["id"], "result": await self._call(request["method"], request["args"])}
+                except Exception as e:
+                    response = {"id": request["id"], "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, separators=(",", ":")).encode() + b"\n")
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+
+class RemoteBackend(Backend):
+    """Backend client for a StateServer. Calls from any number of coroutines
+    share one connection and are matched to replies by id."""
+
+    def __init__(self, path=STATE_SOCKET):
+        self.path = path
+        self._ids = itertools.count()
+        self._pending = {}
+        self._connection = None
+        self._known = set()
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+        asyncio.get_running_loop().create_task(self._read(reader))
+        return writer
+
+    async def _read(self, reader):
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(RuntimeError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        finally:
+            # Fail whatever is in flight; the next call reconnects.
+            self._connection = None
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("State service connection lost"))
+
+    async def _call(self, method, *args):
+        if self._connection is None:
+            self._connection = asyncio.ensure_future(self._connect())
+        try:
+            writer = await asyncio.shield(self._connection)
+        except Exception:
+            self._connection = None
+            raise
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        writer.write(json.dumps({"id": request_id, "method": method, "args": args}, separators=(",", ":")).encode() + b"\n")
+        await writer.drain()
+        return await future
+
+    async def get_user(self, guild_id, user_id):
+        return await self._call("get_user", guild_id, user_id)
+
+    async def ensure_user(self, guild_id, user_id):
+        # Once the service has created a (guild, user) it stays; don't ask again over the socket.
+        if (guild_id, user_id) in self._known:
+            return
+        await self._call("ensure_user", guild_id, user_id)
+        self._known.add((guild_id, user_id))
+
+    async def record_solve(self, guild_id, user_id, count=1, now=None):
+        await self._call("record_solve", guild_id, user_id, count, now.isoformat() if now else None)
+        self._known.add((guild_id, user_id))
+
+    async def set_solves(self, guild_id, user_id, problems_solved):
+        await self._call("set_solves", guild_id, user_id, problems_solved)
+
+    async def set_goal(self, guild_id, user_id, goal):
+        await self._call("set_goal", guild_id, user_id, goal)
+
+    async def top_solvers(self, guild_id, limit):
+        return [tuple(row) for row in await self._call("top_solvers", guild_id, limit)]
+
+    async def global_top_solvers(self, limit):
+        return [tuple(row) for row in await self._call("global_top_solvers", limit)]
+
+    async def rank(self, guild_id, user_id):
+        return await self._call("rank", guild_id, user_id)
+
+    async def activity_since(self, guild_id, user_id, since):
+        return await self._call("activity_since", guild_id, user_id, since.isoformat())
+
+    async def streak(self, guild_id, user_id):
+        return await self._call("streak", guild_id, user_id)
+
+    async def top_streaks(self, guild_id, limit):
+        return [tuple(row) for row in await self._call("top_streaks", guild_id, limit)]
+
+    async def last_active_all(self, guild_ids=None):
+        # Filtered in the service, so a worker only receives its own guilds.
+        return await self._call("last_active_all", None if guild_ids is None else list(guild_ids))
+
+    async def legacy_users(self):
+        return await self._call("legacy_users")
+
+    async def adopt(self, guild_id, user_ids):
+        await self._call("adopt", guild_id, list(user_ids))
+
+
+async def serve(backend_name="json", path=STATE_SOCKET):
+    backend = open_backend(backend_name)
+    server = StateServer(backend, path)
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await server.start()
+    print(f"State service listening on {path}")
+    try:
+        await stopped.wait()
+    finally:
+        await server.close()
+        backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(os.getenv("STORAGE_BACKEND", "json"), os.getenv("STATE_SOCKET", STATE_SOCKET)))
@@ -0,0 +1,478 @@
+import asyncio
+import datetime
+import json
+import os
+
+import metrics
+from activity import ROLLUP_HORIZON, ActivitySeries
+from persistence import SnapshotWriter
+from ranking import RankIndex
+
+DATA_FILE = "data.json"
+JOURNAL_FILE = "data.journal"
+
+# Records from the flat, pre-guild data.json layout live in this partition
+# until their user is first seen in a guild, which then adopts the record.
+LEGACY_GUILD = "legacy"
+DM_GUILD = "dm"
+
+
+def new_user():
+    return {"problems_solved": 0, "last_active": "Never", "activity": ActivitySeries(), "goal": 0, "streak": 0, "longest_streak": 0}
+
+
+def adopts_legacy(guild_id):
+    # DMs are not a guild; a pre-guild record waits for the user's first guild.
+    return guild_id not in (LEGACY_GUILD, DM_GUILD)
+
+
+def partition_layout(data):
+    if any(isinstance(user, dict) and "problems_solved" in user for user in data.values()):
+        return {LEGACY_GUILD: data}
+    return data
+
+
+def streak_runs(days):
+    # (trailing run, longest run) of consecutive day ordinals in sorted `days`.
+    streak = longest = 0
+    for i, day in enumerate(days):
+        streak = streak + 1 if i and day - days[i - 1] == 1 else 1
+        longest = max(longest, streak)
+    return streak, longest
+
+
+def init_streak(user):
+    # Only daily-resolution history is walked; a longest streak that reached
+    # back into rolled-up weeks is kept from the maintained state.
+    days = user["activity"].active_days()
+    streak, longest = streak_runs(days)
+    user["streak"] = streak
+    user["longest_streak"] = max(longest, user.get("longest_streak", 0) if user["activity"].weeks else 0)
+    if days:
+        user["streak_day"] = datetime.date.fromordinal(days[-1]).isoformat()
+    else:
+        user.pop("streak_day", None)
+
+
+def advance_streak(user, date):
+    # O(1) for the usual case of activity landing on the latest day or the one
+    # after it; anything out of order falls back to a full recompute.
+    last_day = user.get("streak_day")
+    if "streak" not in user or (last_day is not None and date < last_day):
+        init_streak(user)
+        return
+    if date == last_day:
+        return
+    if last_day is not None and datetime.date.fromisoformat(date) - datetime.date.fromisoformat(last_day) == datetime.timedelta(days=1):
+        user["streak"] += 1
+    else:
+        user["streak"] = 1
+    user["streak_day"] = date
+    user["longest_streak"] = max(user.get("longest_streak", 0), user["streak"])
+
+
+def current_streak(user, today=None):
+    # The run of active days ending on the most recent one (zero if that day is
+    # still in the future), read from maintained state.
+    today = today or datetime.datetime.utcnow().date()
+    last_day = user.get("streak_day")
+    if last_day is None or last_day > today.isoformat():
+        return 0
+    return user.get("streak", 0)
+
+
+def apply_event(data, event):
+    # Journal events carry absolute values rather than deltas, so replaying an
+    # event that already made it into the snapshot is harmless. Events written
+    # before guild partitioning have no "guild" and belong to the legacy one.
+    partition = data.setdefault(event.get("guild", LEGACY_GUILD), {})
+    op = event["op"]
+    if op == "adopt":
+        legacy = data.get(LEGACY_GUILD, {})
+        if event["user"] in legacy and event["user"] not in partition:
+            partition[event["user"]] = legacy.pop(event["user"])
+        return
+    user = partition.setdefault(event["user"], new_user())
+    if op == "solve":
+        user["activity"].set(datetime.date.fromisoformat(event["date"]).toordinal(), event["day_count"])
+        advance_streak(user, event["date"])
+        user["problems_solved"] = event["problems_solved"]
+        user["last_active"] = event["last_active"]
+    elif op == "solves":
+        user["problems_solved"] = event["problems_solved"]
+    elif op == "goal":
+        user["goal"] = event["goal"]
+
+
+class ActivityStore:
+    """Write-behind store: mutations hit memory at once and are appended to a
+    journal in batches; the journal is periodically compacted into the JSON
+    snapshot. Startup replays snapshot plus journal.
+
+    State is partitioned as guild_id -> user_id -> record. Each record's
+    activity is an ActivitySeries; days older than `rollup_horizon` are
+    rolled up into weeks at startup and on every compaction."""
+
+    def __init__(self, data_file=DATA_FILE, journal_file=JOURNAL_FILE, flush_interval=1.0, compact_every=5000, rollup_horizon=ROLLUP_HORIZON):
+        self.data_file = data_file
+        self.journal_file = journal_file
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.rollup_horizon = rollup_horizon
+        self.data = {}
+        self.writer = SnapshotWriter(data_file, indent=4, default=ActivitySeries.dump)
+        self._pending = []
+        self._journal_events = 0
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def load(self):
+        data = {}
+        if os.path.exists(self.data_file):
+            with open(self.data_file, "r") as file:
+                data = partition_layout(json.load(file))
+        for partition in data.values():
+            for user in partition.values():
+                user["activity"] = ActivitySeries.load(user.get("activity"))
+        replayed = 0
+        if os.path.exists(self.journal_file):
+            good = 0
+            with open(self.journal_file, "rb") as file:
+                for line in file:
+                    # A crash mid-append leaves at most one torn line at the tail.
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    apply_event(data, event)
+                    replayed += 1
+                    good += len(line)
+            if good < os.path.getsize(self.journal_file):
+                # Cut the torn tail, or the next append would be glued onto it.
+                os.truncate(self.journal_file, good)
+        for partition in data.values():
+            for user in partition.values():
+                if "streak" not in user:
+                    init_streak(user)
+        self.data = data
+        self._journal_events = replayed
+        self.roll_up()
+        return data
+
+    def roll_up(self, today=None):
+        today = today or datetime.datetime.utcnow().date()
+        cutoff = today.toordinal() - self.rollup_horizon
+        return sum(user["activity"].roll_up(cutoff) for partition in self.data.values() for user in partition.values())
+
+    def partition(self, guild_id):
+        return self.data.setdefault(guild_id, {})
+
+    def get(self, guild_id, user_id):
+        partition = self.partition(guild_id)
+        if user_id not in partition:
+            if user_id in self.data.get(LEGACY_GUILD, {}) and adopts_legacy(guild_id):
+                self._log({"op": "adopt", "guild": guild_id, "user": user_id})
+            else:
+                partition[user_id] = new_user()
+        return partition[user_id]
+
+    def _log(self, event):
+        apply_event(self.data, event)
+        self._pending.append(event)
+
+    def record_solve(self, guild_id, user_id, now=None, count=1):
+        now = now or datetime.datetime.utcnow()
+        user = self.get(guild_id, user_id)
+        date = now.date().isoformat()
+        # A solve may be recorded after a later one (coalesced credits carry
+        # the time they were posted), so last_active never moves back.
+        last_active = now.isoformat()
+        if user["last_active"] != "Never":
+            last_active = max(last_active, user["last_active"])
+        self._log({
+            "op": "solve",
+            "guild": guild_id,
+            "user": user_id,
+            "date": date,
+            "day_count": user["activity"].get(now.date().toordinal()) + count,
+            "problems_solved": user["problems_solved"] + count,
+            "last_active": last_active,
+        })
+
+    def set_solves(self, guild_id, user_id, problems_solved):
+        self.get(guild_id, user_id)
+        self._log({"op": "solves", "guild": guild_id, "user": user_id, "problems_solved": problems_solved})
+
+    def set_goal(self, guild_id, user_id, goal):
+        self.get(guild_id, user_id)
+        self._log({"op": "goal", "guild": guild_id, "user": user_id, "goal": goal})
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if self._journal_events >= self.compact_every:
+                    await self.compact()
+            except Exception as e:
+                print(f"Error persisting data: {e}")
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush_pending()
+
+    async def _flush_pending(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        # Logged events are never mutated afterwards, so the worker thread can
+        # serialize them while the loop carries on.
+        await asyncio.to_thread(self._append, batch)
+        metrics.SAVES.inc(label_value="journal")
+        self._journal_events += len(batch)
+
+    def _append(self, batch):
+        with open(self.journal_file, "a") as file:
+            file.write("".join(json.dumps(event, separators=(",", ":")) + "\n" for event in batch))
+            file.flush()
+            os.fsync(file.fileno())
+
+    async def compact(self):
+        async with self._lock:
+            # Anything recorded while the snapshot is being written stays
+            # pending and goes to the fresh journal once the lock is released.
+            await self._flush_pending()
+            self.roll_up()
+            await self.writer.save(self._snapshot)
+            await asyncio.to_thread(self._truncate_journal)
+            self._journal_events = 0
+
+    def _snapshot(self):
+        return {
+            guild_id: {user_id: {**user, "activity": user["activity"].copy()} for user_id, user in partition.items()}
+            for guild_id, partition in self.data.items()
+        }
+
+    def _truncate_journal(self):
+        open(self.journal_file, "w").close()
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._pending = []
+        self.writer.save_sync(self._snapshot())
+        self._truncate_journal()
+
+
+class Backend:
+    """Interface the bot talks to. Every query is a coroutine so backends that
+    do real I/O can run it off the event loop. State is scoped per guild; the
+    global_* queries aggregate a user across every guild."""
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def get_user(self, guild_id, user_id):
+        raise NotImplementedError
+
+    async def ensure_user(self, guild_id, user_id):
+        raise NotImplementedError
+
+    async def record_solve(self, guild_id, user_id, count=1, now=None):
+        # `now` (naive UTC) dates the solve; it defaults to the current time.
+        raise NotImplementedError
+
+    async def set_solves(self, guild_id, user_id, problems_solved):
+        raise NotImplementedError
+
+    async def set_goal(self, guild_id, user_id, goal):
+        raise NotImplementedError
+
+    async def top_solvers(self, guild_id, limit):
+        raise NotImplementedError
+
+    async def global_top_solvers(self, limit):
+        raise NotImplementedError
+
+    async def rank(self, guild_id, user_id):
+        raise NotImplementedError
+
+    async def activity_since(self, guild_id, user_id, since):
+        raise NotImplementedError
+
+    async def streak(self, guild_id, user_id):
+        raise NotImplementedError
+
+    async def top_streaks(self, guild_id, limit):
+        raise NotImplementedError
+
+    async def last_active_all(self, guild_ids=None):
+        raise NotImplementedError
+
+    async def legacy_users(self):
+        raise NotImplementedError
+
+    async def adopt(self, guild_id, user_ids):
+        raise NotImplementedError
+
+
+class Partition:
+    def __init__(self, users):
+        self.users = users
+        self.ranks = RankIndex((user_id, user.get("problems_solved", 0)) for user_id, user in users.items())
+        self.streaks = RankIndex((user_id, user["streak"]) for user_id, user in users.items())
+
+    def index(self, user_id):
+        user = self.users[user_id]
+        self.ranks.update(user_id, user.get("problems_solved", 0))
+        self.streaks.update(user_id, user["streak"])
+
+    def discard(self, user_id):
+        self.ranks.discard(user_id)
+        self.streaks.discard(user_id)
+
+
+class JsonBackend(Backend):
+    def __init__(self, data_file=DATA_FILE, journal_file=JOURNAL_FILE, rollup_horizon=ROLLUP_HORIZON):
+        self.store = ActivityStore(data_file, journal_file, rollup_horizon=rollup_horizon)
+        self.data = self.store.load()
+        self.partitions = {guild_id: Partition(users) for guild_id, users in self.data.items()}
+        self.homes = {}
+        totals = {}
+        for guild_id, users in self.data.items():
+            for user_id, user in users.items():
+                self.homes.setdefault(user_id, set()).add(guild_id)
+                totals[user_id] = totals.get(user_id, 0) + user.get("problems_solved", 0)
+        self.global_ranks = RankIndex(totals.items())
+
+    def start(self):
+        self.store.start()
+
+    def close(self):
+        self.store.close()
+
+    def _partition(self, guild_id):
+        partition = self.partitions.get(guild_id)
+        if partition is None:
+            partition = self.partitions[guild_id] = Partition(self.store.partition(guild_id))
+        return partition
+
+    def _user(self, guild_id, user_id):
+        partition = self._partition(guild_id)
+        if user_id not in partition.users:
+            adopted = user_id in self.data.get(LEGACY_GUILD, {}) and adopts_legacy(guild_id)
+            self.store.get(guild_id, user_id)
+            if adopted:
+                self.partitions[LEGACY_GUILD].discard(user_id)
+                self.homes[user_id].discard(LEGACY_GUILD)
+            elif user_id not in self.global_ranks:
+                self.global_ranks.update(user_id, 0)
+            self.homes.setdefault(user_id, set()).add(guild_id)
+            partition.index(user_id)
+        return partition.users[user_id]
+
+    def _set_total(self, user_id, delta):
+        if delta:
+            self.global_ranks.update(user_id, self.global_ranks.score(user_id) + delta)
+
+    async def get_user(self, guild_id, user_id):
+        return self._user(guild_id, user_id)
+
+    async def ensure_user(self, guild_id, user_id):
+        self._user(guild_id, user_id)
+
+    async def record_solve(self, guild_id, user_id, count=1, now=None):
+        self._user(guild_id, user_id)
+        self.store.record_solve(guild_id, user_id, now=now, count=count)
+        self.partitions[guild_id].index(user_id)
+        self._set_total(user_id, count)
+
+    async def set_solves(self, guild_id, user_id, problems_solved):
+        before = self._user(guild_id, user_id)["problems_solved"]
+        self.store.set_solves(guild_id, user_id, problems_solved)
+        self.partitions[guild_id].index(user_id)
+        self._set_total(user_id, problems_solved - before)
+
+    async def set_goal(self, guild_id, user_id, goal):
+        self._user(guild_id, user_id)
+        self.store.set_goal(guild_id, user_id, goal)
+
+    async def top_solvers(self, guild_id, limit):
+        partition = self._partition(guild_id)
+        return [(user_id, partition.users[user_id]) for user_id, _ in partition.ranks.top(limit)]
+
+    async def global_top_solvers(self, limit):
+        rows = []
+        for user_id, total in self.global_ranks.top(limit):
+            last_active = max((self.data[guild_id][user_id]["last_active"] for guild_id in self.homes[user_id]
+                               if self.data[guild_id][user_id]["last_active"] != "Never"), default="Never")
+            rows.append((user_id, {"problems_solved": total, "last_active": last_active}))
+        return rows
+
+    async def rank(self, guild_id, user_id):
+        self._user(guild_id, user_id)
+        return self.partitions[guild_id].ranks.rank(user_id)
+
+    async def activity_since(self, guild_id, user_id, since):
+        activity = self._user(guild_id, user_id)["activity"]
+        return activity.total(since.toordinal(), datetime.datetime.utcnow().date().toordinal())
+
+    async def streak(self, guild_id, user_id):
+        return current_streak(self._user(guild_id, user_id))
+
+    async def top_streaks(self, guild_id, limit):
+        partition = self._partition(guild_id)
+        today = datetime.datetime.utcnow().date()
+        count = limit
+        while True:
+            candidates = partition.streaks.top(count)
+            # Streaks ending on a future day (clock skew) count as zero, so they
+            # are skipped here and the window widened to make up for them.
+            streaks = [(user_id, streak_count) for user_id, streak_count in candidates
+                       if streak_count > 0 and current_streak(partition.users[user_id], today) > 0]
+            if len(streaks) >= limit or len(candidates) < count or candidates[-1][1] == 0:
+                return streaks[:limit]
+            count *= 2
+
+    async def last_active_all(self, guild_ids=None):
+        # `guild_ids` limits the result to those partitions, e.g. one worker's guilds.
+        partitions = self.data if guild_ids is None else {guild_id: self.data[guild_id] for guild_id in guild_ids if guild_id in self.data}
+        return {
+            guild_id: {user_id: user["last_active"] for user_id, user in users.items() if user.get("last_active", "Never") != "Never"}
+            for guild_id, users in partitions.items()
+        }
+
+    async def legacy_users(self):
+        return list(self.data.get(LEGACY_GUILD, {}))
+
+    async def adopt(self, guild_id, user_ids):
+        # Moves the pre-guild records of `user_ids`, members of the guild, into it.
+        if not adopts_legacy(guild_id):
+            return
+        legacy = self.data.get(LEGACY_GUILD, {})
+        users = self._partition(guild_id).users
+        for user_id in user_ids:
+            if user_id in legacy and user_id not in users:
+                self._user(guild_id, user_id)
+
+
+def open_backend(name="json"):
+    if name == "json":
+        return JsonBackend()
+    if name == "sqlite":
+        from sqlite_backend import SqliteBackend
+        return SqliteBackend()
+    if name == "remote":
+        from state_service import STATE_SOCKET, RemoteBackend
+        return RemoteBackend(os.getenv("STATE_SOCKET", STATE_SOCKET))
+    raise ValueError(f"Unknown storage backend: {name}")
@@ -0,0 +1,31 @@
+import datetime
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_streaks import as_dict, get_streak, random_history
+from storage import advance_streak, current_streak, new_user
+
+
+def test_maintained_streaks_match_get_streak():
+    # Random histories, including gaps, future days and out-of-order delivery.
+    random.seed(0)
+    today = datetime.datetime.utcnow().date()
+    for _ in range(5000):
+        user = new_user()
+        for date in random_history(today):
+            day = datetime.date.fromisoformat(date).toordinal()
+            user["activity"].set(day, user["activity"].get(day) + 1)
+            advance_streak(user, date)
+            assert current_streak(user, today) == get_streak(as_dict(user["activity"])), user
+        longest = run = 0
+        previous = None
+        for day in sorted(datetime.date.fromisoformat(date) for date in as_dict(user["activity"])):
+            run = run + 1 if previous and day - previous == datetime.timedelta(days=1) else 1
+            longest = max(longest, run)
+            previous = day
+        assert user["longest_streak"] == longest, user
@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+import time
+
+import metrics
+
+REACTION = "✅"
+REPLY_TEXT = "Excellent work! Your coding progress has been recorded."
+
+
+class SolveThrottle:
+    """Coalesces code-block credits per (guild, user).
+
+    The first credited message in a window is acknowledged (a reaction by
+    default, or the old reply); later ones in the same window are not, and
+    when the window closes the whole count is recorded with one
+    record_solve(), dated when its last block was posted. A window never spans
+    midnight UTC. Acknowledgements are also capped at `channel_limit` per
+    channel per window. Stored counts lag by at most `window` seconds."""
+
+    def __init__(self, storage, window=10.0, channel_limit=5, ack="reaction"):
+        if ack not in ("reaction", "reply"):
+            raise ValueError(f"Unknown acknowledgement: {ack}")
+        self.storage = storage
+        self.window = window
+        self.channel_limit = channel_limit
+        self.ack = ack
+        self.route = "add_reaction" if ack == "reaction" else "reply"
+        self._pending = {}
+        self._posted = {}
+        self._windows = {}
+        self._channels = {}
+        self.credited = 0
+        self.acked = 0
+        self.suppressed = 0
+        self.flushes = 0
+
+    def stats(self):
+        return {"credited": self.credited, "acked": self.acked, "suppressed": self.suppressed, "flushes": self.flushes}
+
+    def pending(self, guild_id, user_id, day):
+        # Credits posted on `day` (a UTC date) that are not recorded yet.
+        key = (guild_id, user_id)
+        if key not in self._pending or self._posted[key].date() != day:
+            return 0
+        return self._pending[key]
+
+    async def credit(self, guild_id, user_id, message):
+        self.credited += 1
+        key = (guild_id, user_id)
+        now = datetime.datetime.utcnow()
+        if key in self._pending and self._posted[key].date() != now.date():
+            # Close yesterday's window first so its blocks keep their day.
+            task = self._windows.pop(key, None)
+            if task is not None:
+                task.cancel()
+            await self._record(key)
+        if key in self._pending:
+            self._posted[key] = now
+            self._pending[key] += 1
+            self._suppress()
+            return
+        self._pending[key] = 1
+        self._posted[key] = now
+        self._windows[key] = asyncio.get_running_loop().create_task(self._close_window(key))
+        if self._channel_allows(message.channel.id):
+            await self._acknowledge(message)
+        else:
+            self._suppress()
+
+    def _suppress(self):
+        self.suppressed += 1
+        metrics.REST_SUPPRESSED.inc(label_value=self.route)
+
+    def _channel_allows(self, channel_id):
+        now = time.monotonic()
+        if len(self._channels) > 4096:
+            self._channels = {key: value for key, value in self._channels.items() if now - value[0] < self.window}
+        started, acks = self._channels.get(channel_id, (now, 0))
+        if now - started >= self.window:
+            started, acks = now, 0
+        if acks >= self.channel_limit:
+            return False
+        self._channels[channel_id] = (started, acks + 1)
+        return True
+
+    async def _acknowledge(self, message):
+        metrics.REST_CALLS.inc(label_value=self.route)
+        try:
+            if self.ack == "reaction":
+                await message.add_reaction(REACTION)
+            else:
+                await message.reply(REPLY_TEXT)
+            self.acked += 1
+        except Exception as e:
+            print(f"Error acknowledging message {message.id}: {e}")
+
+    async def _close_window(self, key):
+        await asyncio.sleep(self.window)
+        del self._windows[key]
+        await self._record(key)
+
+    async def _record(self, key):
+        count = self._pending.pop(key, 0)
+        posted = self._posted.pop(key, None)
+        if not count:
+            return
+        guild_id, user_id = key
+        try:
+            await self.storage.record_solve(guild_id, user_id, count, now=posted)
+            self.flushes += 1
+        except Exception as e:
+            print(f"Error recording {count} solve(s) for {user_id}: {e}")
+
+    async def flush(self):
+        # Records every open window now, e.g. before shutting down. Only
+        # windows still sleeping are cancelled, never one mid-record.
+        windows, self._windows = self._windows, {}
+        for task in windows.values():
+            task.cancel()
+        for key in list(self._pending):
+            await self._record(key)
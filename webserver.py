@@ -0,0 +1,35 @@
+import logging
+import threading
+
+from flask import Flask, Response, jsonify
+
+import metrics
+
+
+def create_app(bot, loop_lag):
+    app = Flask(__name__)
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/health")
+    def health():
+        ready = bot.is_ready()
+        body = {
+            "status": "ok" if ready else "starting",
+            "latency": bot.latency if ready else None,
+            "guilds": len(bot.guilds),
+            "loop_lag_max": loop_lag.max_lag,
+        }
+        return jsonify(body), 200 if ready else 503
+
+    return app
+
+
+def start_webserver(bot, loop_lag, port=8080):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = create_app(bot, loop_lag)
+    thread = threading.Thread(target=app.run, kwargs={"host": "0.0.0.0", "port": port}, daemon=True)
+    thread.start()
+    return thread